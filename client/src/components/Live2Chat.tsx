@@ -82,7 +82,9 @@ const Live2Chat: React.FC<Live2ChatProps> = ({ onSearchResults }) => {
           setIsStreaming(true);
           setIsLoading(false);
           setMessages([]);
-          socket.emit('start_live2_session');
+          // binary_audio: server sends raw PCM as binary attachments
+          // (ArrayBuffer) instead of base64 strings
+          socket.emit('start_live2_session', { binary_audio: true });
         });
         socket.on('live2_session_started', (data) => {
           setSessionId(data.session_id);
@@ -125,7 +127,35 @@ const Live2Chat: React.FC<Live2ChatProps> = ({ onSearchResults }) => {
           }
         });
         socket.on('live2_audio', (data) => {
-          // Optionally play audio response
+          // Optionally play audio response; data.audio is an ArrayBuffer
+          // when binary_audio was negotiated, else a base64 string
+        });
+        // Batched event: one emit per Gemini response carrying all its parts
+        socket.on('live2_multi', (data) => {
+          const newMessages: ChatMessage[] = [];
+          for (const part of data.parts || []) {
+            if (part.kind === 'tool') {
+              onSearchResults(part.results);
+              newMessages.push({
+                sender: 'Gemini',
+                text: `Function result: ${JSON.stringify(part.results)}`,
+                timestamp: Date.now(),
+                function_name: part.name,
+                results: part.results
+              });
+            } else if (part.kind === 'text' || part.kind === 'transcription') {
+              newMessages.push({
+                sender: part.sender || 'Gemini',
+                text: part.text,
+                timestamp: Date.now()
+              });
+            } else if (part.kind === 'audio') {
+              // Optionally play audio response (part.audio_b64)
+            }
+          }
+          if (newMessages.length > 0) {
+            setMessages((prev) => [...prev, ...newMessages]);
+          }
         });
       }
     } catch (err) {
@@ -172,13 +202,13 @@ const Live2Chat: React.FC<Live2ChatProps> = ({ onSearchResults }) => {
           sessionId &&
           pcmData
         ) {
-          const b64 = btoa(String.fromCharCode(...new Uint8Array(pcmData)));
+          // Send raw binary PCM; Socket.IO serializes ArrayBuffers as binary
+          // attachments, avoiding the base64 inflation and encode cost.
           console.log('[Live2] Emitting audio_chunk:', {
             session_id: sessionId,
-            pcm_length: pcmData?.byteLength || pcmData?.length,
-            b64_length: b64.length
+            pcm_length: pcmData?.byteLength || pcmData?.length
           });
-          socketRef.current.emit('audio_chunk', { session_id: sessionId, audio: b64 });
+          socketRef.current.emit('audio_chunk', { session_id: sessionId, audio: pcmData });
         }
       };
     } catch (err) {
@@ -217,18 +247,14 @@ const Live2Chat: React.FC<Live2ChatProps> = ({ onSearchResults }) => {
     ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
     canvas.toBlob((blob) => {
       if (!blob) return;
-      const reader = new FileReader();
-      reader.onloadend = () => {
-        const dataUrl = reader.result as string; // Full data URL (e.g., 'data:image/jpeg;base64,...')
-        // --- Debug log for emission ---
-        console.log('[Live2] Emitting video_frame', { sessionId, dataUrlLength: dataUrl.length });
-        try {
-          socketRef.current!.emit('video_frame', { session_id: sessionId, frame: dataUrl });
-        } catch (err) {
-          console.error('[Live2] Error emitting video_frame:', err);
-        }
-      };
-      reader.readAsDataURL(blob);
+      // Send the raw JPEG Blob as a Socket.IO binary attachment: skips the
+      // FileReader base64 round-trip and the ~33% data-URL inflation
+      console.log('[Live2] Emitting video_frame', { sessionId, blobSize: blob.size });
+      try {
+        socketRef.current!.emit('video_frame', { session_id: sessionId, frame: blob });
+      } catch (err) {
+        console.error('[Live2] Error emitting video_frame:', err);
+      }
     }, 'image/jpeg', 0.8);
   }, [sessionId]);
 
@@ -1,3 +1,30 @@
+# Eventlet must monkey-patch the stdlib before anything else opens sockets so
+# each Socket.IO connection runs on a cheap greenlet instead of an OS thread.
+# threading stays unpatched: the background asyncio loop must run on a real OS
+# thread (a greenlet calling loop.run_forever would block the eventlet hub).
+try:
+    import eventlet
+    eventlet.monkey_patch(thread=False)
+    from eventlet import tpool
+    ASYNC_MODE = 'eventlet'
+except ImportError:
+    eventlet = None
+    tpool = None
+    ASYNC_MODE = 'threading'
+
+def _run_blocking(func, *args, **kwargs):
+    """Run a blocking callable without stalling the eventlet hub.
+
+    Under eventlet every HTTP route and Socket.IO handler is a greenlet on
+    one hub thread. gRPC calls go through the C core (not green sockets) and
+    concurrent.futures waits sit on an unpatched threading.Condition, so
+    calling them inline freezes all live sessions for the duration. tpool
+    hands the call to a real worker thread and green-waits on the result.
+    """
+    if tpool is not None:
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
 import os
 import json
 import logging
@@ -8,24 +35,31 @@ from flask_socketio import SocketIO, emit, Namespace
 import concurrent.futures
 import threading
 import asyncio
-from bigquery_service import BigQueryService
-from vertex_ai_service import VertexAIService
-import time
-import re
-import random
+from search_service import search_products
 from queue import Queue
-from utils import normalize_product
 from gemini_live2_service import GeminiLive2Service
 
-# Configure logging to file and console
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(name)s %(message)s',
-    handlers=[
-        logging.FileHandler('server.log', mode='a', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging to file and console via a queue so the blocking file and
+# stream writes happen on a dedicated listener thread instead of inline on
+# the request / Socket.IO handler path.
+import atexit
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+_log_queue = queue.Queue(-1)
+_log_formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s')
+_log_file_handler = logging.FileHandler('server.log', mode='a', encoding='utf-8')
+_log_file_handler.setFormatter(_log_formatter)
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(_log_formatter)
+
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
+
+_log_listener = QueueListener(_log_queue, _log_file_handler, _log_stream_handler,
+                              respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -37,7 +71,42 @@ from gemini_live_service import GeminiLiveService
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)
+
+# Use orjson for JSON responses when available — it serializes the /api/search
+# results list several times faster than stdlib json.
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+
+    class ORJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+    logger.info("Using orjson for Flask JSON responses")
+
+    class _SocketIOJson:
+        """orjson behind the stdlib-json surface python-socketio expects.
+
+        Socket.IO packet encoding needs dumps() to return str; extra kwargs
+        (e.g. separators) are accepted and ignored — orjson's compact output
+        already matches.
+        """
+        @staticmethod
+        def dumps(obj, *args, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        @staticmethod
+        def loads(s, *args, **kwargs):
+            return orjson.loads(s)
+
+    _socketio_json = _SocketIOJson
+except ImportError:
+    orjson = None
+    _socketio_json = json
 
 # Set app secret key
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'a_default_fallback_secret_key!')
@@ -51,16 +120,35 @@ REACT_APP_ORIGIN_IP = f"http://127.0.0.1:{REACT_APP_PORT}"
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', f'{REACT_APP_ORIGIN},{REACT_APP_ORIGIN_IP},http://localhost:3000,http://127.0.0.1:3000')
 allowed_origins = CORS_ALLOWED_ORIGINS.split(',')
 
+# Single CORS initialization — registering CORS twice installs two
+# after_request hooks that both run on every response
+CORS(app, resources={r"/*": {"origins": allowed_origins}}, supports_credentials=True)
+
+# Transport-level logging is very chatty (it logs every ping/frame), so only
+# enable it when explicitly requested
+SOCKETIO_DEBUG = os.getenv('SOCKETIO_DEBUG', '0') == '1'
+
 # Initialize Socket.IO with proper configuration
 socketio = SocketIO(
     app,
-    async_mode='threading',  # Keep threading mode as it's already working
+    async_mode=ASYNC_MODE,  # eventlet greenlets when available, threading fallback
     cors_allowed_origins=allowed_origins,
-    logger=True,  # Enable Socket.IO logger
-    engineio_logger=True,  # Enable Engine.IO logger
+    logger=SOCKETIO_DEBUG,  # Enable Socket.IO logger via SOCKETIO_DEBUG=1
+    engineio_logger=SOCKETIO_DEBUG,  # Enable Engine.IO logger via SOCKETIO_DEBUG=1
     ping_timeout=60,  # Increase ping timeout
     ping_interval=25,  # Adjust ping interval
-    max_http_buffer_size=1e8  # Increase buffer size for large messages
+    # 4 MB comfortably fits a 1080p JPEG frame; the old 100 MB ceiling let a
+    # single rogue client allocate 100 MB per message
+    max_http_buffer_size=4 * 1024 * 1024,
+    # Engine.IO compression applies to the HTTP long-polling transport;
+    # raising the threshold keeps small audio payloads uncompressed (deflate
+    # on PCM/JPEG is pure CPU for near-zero size win). WebSocket binary
+    # attachments bypass compression entirely in python-engineio.
+    http_compression=True,
+    compression_threshold=1024,
+    # orjson (when installed) encodes emit payloads — search results, batched
+    # live2_multi parts — several times faster than stdlib json
+    json=_socketio_json
 )
 
 # Add default error handler for Socket.IO
@@ -68,13 +156,59 @@ socketio = SocketIO(
 def default_error_handler(e):
     logger.error(f"SocketIO error: {e}", exc_info=True)
 
-# Configure CORS
-REACT_APP_PORT = os.getenv('REACT_APP_PORT', '5173')
-REACT_APP_ORIGIN = f"http://localhost:{REACT_APP_PORT}"
-REACT_APP_ORIGIN_IP = f"http://127.0.0.1:{REACT_APP_PORT}"
+class _GreenEmitter:
+    """Marshals emits from foreign OS threads onto the eventlet hub.
+
+    Under eventlet, socketio.emit from a non-green thread (the background
+    asyncio loop, the TTS/emit executor workers, future callbacks) schedules
+    the socket's outbound wake-up on that thread's hub, where nothing runs —
+    packets sit undelivered until unrelated green traffic flushes them.
+    Those paths enqueue on a plain thread-safe Queue instead, and one green
+    background task performs the real emits on the hub, using the same
+    polling pattern as _drain_frame_acks (queue.Queue.get() would block the
+    hub on an unpatched threading.Condition, so the pump never waits on it).
+    """
+
+    def __init__(self, sio):
+        self._sio = sio
+        self._queue = queue.Queue()
+        self._started = False
+
+    def start(self):
+        # Called from green connect handlers; greenlets don't preempt, so
+        # the started check is race-free
+        if not self._started:
+            self._started = True
+            self._sio.start_background_task(self._pump)
+
+    def _pump(self):
+        while True:
+            try:
+                args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                self._sio.sleep(0.005)
+                continue
+            try:
+                self._sio.emit(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error emitting queued event: {e}")
 
-# Use a more permissive CORS configuration for development
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+    def emit(self, *args, **kwargs):
+        self._queue.put((args, kwargs))
+
+# Everything that emits from outside a Socket.IO handler goes through this;
+# in threading mode cross-thread emits are safe, so it is the socketio
+# object itself
+emitter = _GreenEmitter(socketio) if ASYNC_MODE == 'eventlet' else socketio
+
+# Use uvloop for the background event loop when available (faster scheduling
+# for the Gemini Live coroutines); fall back to the default loop otherwise.
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("uvloop event loop policy installed")
+except ImportError:
+    logger.info("uvloop not installed, using default asyncio event loop")
 
 # Asyncio event loop for background tasks
 background_loop = asyncio.new_event_loop()
@@ -103,50 +237,90 @@ def run_asyncio_loop(loop):
                 loop.close()
         print("Asyncio event loop stopped.")
 
-# Start the background thread for asyncio
-background_thread = concurrent.futures.ThreadPoolExecutor(max_workers=1).submit(run_asyncio_loop, background_loop)
+# Start the background thread for asyncio. A plain daemon thread avoids the
+# queue/lock machinery of a one-shot ThreadPoolExecutor and does not keep the
+# process alive on Ctrl-C.
+background_thread = threading.Thread(
+    target=run_asyncio_loop,
+    args=(background_loop,),
+    daemon=True,
+    name='asyncio-bg'
+)
+background_thread.start()
 
 # Initialize services
 gemini_multimodal_service = GeminiMultimodalService()
 gemini_live_service = GeminiLiveService(loop=background_loop) # Pass the loop
 gemini_live2_service = GeminiLive2Service(loop=background_loop)
 
-# Thread pool for async operations
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
 
-# Helper function for CORS preflight requests
+def _close_live_service_http():
+    """Close the shared aiohttp pool on the background loop at shutdown."""
+    try:
+        asyncio.run_coroutine_threadsafe(
+            gemini_live_service.aclose(), background_loop
+        ).result(timeout=5)
+    except Exception:
+        pass
+
+
+atexit.register(_close_live_service_http)
+
+# Thread pool for async operations (shared by request handlers and the
+# background loop; sized via THREAD_POOL_SIZE)
+executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv('THREAD_POOL_SIZE', '10'))
+)
+background_loop.set_default_executor(executor)
+
+# Preflight responses are identical across requests, so the headers are built
+# once at import time. Flask forbids reusing a Response object between
+# requests, so the helper wraps the precomputed headers in a fresh one.
+_PREFLIGHT_HEADERS = [
+    ("Access-Control-Allow-Origin", "*"),
+    ("Access-Control-Allow-Headers", "Content-Type,Authorization"),
+    ("Access-Control-Allow-Methods", "GET,POST,PUT,DELETE,OPTIONS"),
+]
+
 def _build_cors_preflight_response():
-    response = make_response()
-    response.headers.add("Access-Control-Allow-Origin", "*")
-    response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization")
-    response.headers.add("Access-Control-Allow-Methods", "GET,POST,PUT,DELETE,OPTIONS")
-    return response
-
-# Helper function to schedule user message processing
-def _schedule_process_user_message(session_id, message):
-    # Use the application's background_loop for scheduling async tasks
-    asyncio.run_coroutine_threadsafe(
-        gemini_live_service.process_user_message(session_id, message),
-        background_loop  # Use the application's background loop instead of gemini_live_service.loop
-    )
+    return Response(status=200, headers=_PREFLIGHT_HEADERS)
 
 # API Routes for Gemini Multimodal
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle regular chat messages using Gemini Multimodal API"""
-    data = request.json
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid or missing JSON body'}), 400
     message = data.get('message', '')
     history = data.get('history', [])
     
     response = gemini_multimodal_service.generate_content(message, history)
     return jsonify(response)
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream chat responses as NDJSON, one chunk dict per line"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid or missing JSON body'}), 400
+    message = data.get('message', '')
+    history = data.get('history', [])
+
+    def generate():
+        for chunk in gemini_multimodal_service.generate_content_stream(message, history):
+            yield json.dumps(chunk) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 # Search endpoint moved to the bottom of the file with BigQuery and Vertex AI integration
 
 @app.route('/api/chat/image', methods=['POST'])
 def chat_with_image():
     """Handle chat with image using Gemini Multimodal API"""
-    data = request.json
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid or missing JSON body'}), 400
     message = data.get('message', '')
     image_data = data.get('image', '')
     history = data.get('history', [])
@@ -158,52 +332,45 @@ def chat_with_image():
 @app.route('/api/live/start', methods=['POST'])
 def start_live_session():
     """Start a new Gemini Live session"""
-    # This will be an async operation
-    def generate():
-        async def create_session():
-            try:
-                session_id = await gemini_live_service.create_session()
-                return session_id
-            except Exception as e:
-                logger.error(f"Error creating live session: {e}")
-                return None
-        
-        # Create the coroutine object
-        coro = create_session()
-        
-        # Run the async function in the background loop and wait for results
-        future = asyncio.run_coroutine_threadsafe(coro, background_loop)
-        try:
-            # Wait for the coroutine to complete and get the session ID
-            session_id = future.result()
-            if session_id:
-                return jsonify({"session_id": session_id})
-            else:
-                return jsonify({"error": "Failed to create session"}), 500
-        except Exception as e:
-            logger.error(f"Error in start_live_session: {e}")
-            return jsonify({"error": f"Error creating session: {str(e)}"}), 500
-    
-    return generate()
+    # Run the coroutine in the background loop and wait for the session ID
+    future = asyncio.run_coroutine_threadsafe(
+        gemini_live_service.create_session(),
+        background_loop
+    )
+    try:
+        # future.result() waits on an unpatched Condition; green-wait instead
+        session_id = _run_blocking(future.result)
+        if session_id:
+            return jsonify({"session_id": session_id})
+        else:
+            return jsonify({"error": "Failed to create session"}), 500
+    except Exception as e:
+        logger.error(f"Error in start_live_session: {e}")
+        return jsonify({"error": f"Error creating session: {str(e)}"}), 500
 
 @app.route('/api/live/message', methods=['POST', 'OPTIONS'])
 def send_live_message():
     if request.method == 'OPTIONS':
         return _build_cors_preflight_response()
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'error': 'Invalid or missing JSON body'}), 400
         session_id = data.get('session_id')
         message = data.get('message')
-        
+
         if not session_id or not message:
             return jsonify({'error': 'session_id and message are required'}), 400
 
         app.logger.info(f"Received message for session {session_id}: {message[:30]}...")
-                
-        # Process the message in a new thread using the scheduler
-        thread = threading.Thread(target=_schedule_process_user_message, args=(session_id, message))
-        thread.start()
-        
+
+        # run_coroutine_threadsafe is itself thread-safe and non-blocking, so
+        # schedule the coroutine directly instead of spawning a thread for it
+        asyncio.run_coroutine_threadsafe(
+            gemini_live_service.process_user_message(session_id, message),
+            background_loop
+        )
+
         return jsonify({'message': 'Message received, processing...'}), 202
 
     except Exception as e:
@@ -224,39 +391,25 @@ def get_live_response(session_id):
 @app.route('/api/live/end', methods=['POST'])
 def end_live_session():
     """End a Gemini Live session"""
-    data = request.json
+    data = request.get_json(silent=True) or {}
     session_id = data.get('session_id')
     
     if not session_id:
         return jsonify({"error": "No session_id provided"}), 400
-    
-    # This will be an async operation
-    def generate():
-        async def close_session():
-            try:
-                success = await gemini_live_service.end_session(session_id)
-                return success
-            except Exception as e:
-                logger.error(f"Error ending live session: {e}")
-                return False
-        
-        # Create the coroutine object
-        coro = close_session()
-        
-        # Run the async function in the background loop and wait for results
-        future = asyncio.run_coroutine_threadsafe(coro, background_loop)
-        try:
-            # Wait for the coroutine to complete and get the result
-            success = future.result()
-            if success:
-                return jsonify({"status": "success", "message": "Session ended"})
-            else:
-                return jsonify({"error": "Failed to end session"}), 404
-        except Exception as e:
-            logger.error(f"Error in end_live_session: {e}")
-            return jsonify({"error": f"Error ending session: {str(e)}"}), 500
-    
-    return generate()
+
+    # Run the coroutine in the background loop and wait for the result
+    future = asyncio.run_coroutine_threadsafe(
+        gemini_live_service.end_session(session_id),
+        background_loop
+    )
+    try:
+        # end_session can take up to 5 s; future.result() waits on an
+        # unpatched Condition, so green-wait instead of blocking the hub
+        _run_blocking(future.result)
+        return jsonify({"status": "success", "message": "Session ended"})
+    except Exception as e:
+        logger.error(f"Error in end_live_session: {e}")
+        return jsonify({"error": f"Error ending session: {str(e)}"}), 500
 
 # API Routes for Gemini Live2 (VAD+Camera+Audio)
 @app.route('/api/live2/start', methods=['POST'])
@@ -271,7 +424,7 @@ def send_live2_message():
     if request.method == 'OPTIONS':
         return _build_cors_preflight_response()
     # Accept JSON: { session_id, audio (base64 or bytes) }
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     session_id = data.get('session_id')
     audio_b64 = data.get('audio')
     import base64
@@ -287,7 +440,7 @@ def send_live2_message():
 @app.route('/api/live2/end', methods=['POST'])
 def end_live2_session():
     """End a Gemini Live2 session"""
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     session_id = data.get('session_id')
     if not session_id:
         return jsonify({"error": "session_id required"}), 400
@@ -300,7 +453,7 @@ def search():
     try:
         # Handle both GET and POST requests
         if request.method == 'POST':
-            data = request.json
+            data = request.get_json(silent=True)
             if not data:
                 return jsonify({'error': 'No search data provided'}), 400
             query = data.get('query')
@@ -311,106 +464,28 @@ def search():
             image_data = None  # Image data should only be sent via POST
             neighbor_count = int(request.args.get('neighbor_count', 10))
         logger.info(f"/api/search {request.method} received: query={query}, image_data={'yes' if image_data else 'no'}")
-        
-        if not query and not image_data:
-            return jsonify({'error': 'Either query or image_data must be provided'}), 400
-        
-        # Get configuration from environment variables
-        project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
-        region = os.getenv('VERTEX_AI_LOCATION')
-        feature_store_id = os.getenv('FEATURE_STORE_ID')
-        feature_view_id = os.getenv('ENTITY_TYPE_ID')
-        dataset = os.getenv('BIGQUERY_DATASET')
-        
-        # Validate required configuration
-        if not project_id or not region or not feature_store_id or not feature_view_id or not dataset:
-            return jsonify({
-                'error': 'Google Cloud configuration is incomplete',
-                'details': 'Please check your environment variables for Google Cloud, Vertex AI, and BigQuery settings.'
-            }), 500
-        
-        start_time = time.time()
-        
-        # Initialize services
-        vertex_service = VertexAIService(
-            project_id=project_id,
-            location=region,
-            feature_store_id=feature_store_id,
-            feature_view_id=feature_view_id
-        )
-        
-        bigquery_service = BigQueryService(
-            project_id=project_id,
-            dataset=dataset
-        )
-        
-        # Generate embeddings
-        t0 = time.time()
-        embeddings = vertex_service.get_image_embeddings(
+
+        # The pipeline itself lives in search_service so the live services
+        # can call it in-process without an HTTP loopback. It blocks for
+        # seconds on gRPC and future.result(), so keep it off the hub.
+        result = _run_blocking(
+            search_products,
+            query=query,
             image_data=image_data,
-            contextual_text=query
-        )
-        t1 = time.time()
-        logger.info(f"Embeddings generated in {t1-t0:.2f} seconds")
-        
-        # Search feature store
-        t2 = time.time()
-        search_results = vertex_service.search_feature_store(
-            embedding=embeddings,
-            neighbor_count=neighbor_count
+            neighbor_count=neighbor_count,
+            executor=executor
         )
-        t3 = time.time()
-        logger.info(f"Feature store search in {t3-t2:.2f} seconds")
-        
-        if not search_results:
-            return jsonify({
-                'results': [],
-                'message': 'No matching products found',
-                'elapsed_time': time.time() - start_time
-            })
-        
-        # Extract GCS URIs and product IDs
-        gcs_uri_list = [result['gcs_uri'] for result in search_results]
-        product_id_list = [result['product_id'] for result in search_results]
-        
-        # Parallelize BigQuery calls
-        t4 = time.time()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_signed_urls = executor.submit(bigquery_service.get_signed_urls, gcs_uri_list)
-            future_product_info = executor.submit(bigquery_service.get_product_info, product_id_list)
-            signed_urls = future_signed_urls.result()
-            product_info = future_product_info.result()
-        t5 = time.time()
-        logger.info(f"BigQuery get_signed_urls + get_product_info in {t5-t4:.2f} seconds")
-        
-        # Combine results (optimize product info lookup)
-        t6 = time.time()
-        product_info_dict = {str(info['productid']): info for info in product_info}
-        results = []
-        for i, (product_id, signed_url) in enumerate(zip(product_id_list, signed_urls)):
-            product_info_item = product_info_dict.get(product_id)
-            product = {
-                'id': product_id,
-                'image_url': signed_url,
-                'name': f"Product {product_id}",
-                'description': f"This product matches your {query if query else 'image'} search",
-                'price': f"${random.randint(999, 9999)/100:.2f}",
-                'aisle': product_info_item['aisle'] if product_info_item else 'Unknown'
-            }
-            results.append(normalize_product(product, query=query))
-        t7 = time.time()
-        logger.info(f"Product info match + normalization in {t7-t6:.2f} seconds")
-
-        elapsed_time = time.time() - start_time
-        logger.info(f"Total /api/search time (just before response): {elapsed_time:.2f} seconds")
-        
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
         return jsonify({
-            'results': results,
-            'elapsed_time': elapsed_time
-        })
-            
+            'error': 'Google Cloud configuration is incomplete',
+            'details': str(e)
+        }), 500
     except Exception as e:
-        print(f"Error in search endpoint: {str(e)}")
+        logger.error(f"Error in search endpoint: {str(e)}")
         return jsonify({
             'error': 'Search failed',
             'details': str(e)
@@ -419,6 +494,8 @@ def search():
 # Socket.IO event handlers
 @socketio.on('connect')
 def handle_connect():
+    if emitter is not socketio:
+        emitter.start()
     logger.info(f"Client connected: {request.sid}")
     logger.info(f"Transport: {request.environ.get('HTTP_UPGRADE', 'polling')}")
     emit('status', {'message': 'Connected to server'}, room=request.sid)
@@ -430,21 +507,26 @@ def handle_disconnect(sid):
 
 @socketio.on('start_session')
 def handle_start_session():
-    try:
-        client_sid = request.sid  # Capture the client SID here
-        # Schedule the coroutine in the background loop and get a future
-        future = asyncio.run_coroutine_threadsafe(
-            gemini_live_service.create_session(),
-            background_loop
-        )
-        # Wait for the result
-        session_id = future.result(timeout=10)
-        logger.info(f"Created new session with ID: {session_id} for client: {client_sid}")
-        emit('session_created', {'session_id': session_id}, room=client_sid)
-        # No session_ready wait; allow messages immediately
-    except Exception as e:
-        logger.error(f"Error creating session: {e}")
-        emit('error', {'message': f"Error creating session: {str(e)}"}, room=request.sid)
+    client_sid = request.sid  # Capture the client SID here
+
+    # Deliver the result from the background loop instead of blocking a
+    # SocketIO worker thread on future.result()
+    def _on_session_created(future):
+        # Runs on the background loop thread, so emit through the pump
+        try:
+            session_id = future.result()
+            logger.info(f"Created new session with ID: {session_id} for client: {client_sid}")
+            emitter.emit('session_created', {'session_id': session_id}, room=client_sid)
+            # No session_ready wait; allow messages immediately
+        except Exception as e:
+            logger.error(f"Error creating session: {e}")
+            emitter.emit('error', {'message': f"Error creating session: {str(e)}"}, room=client_sid)
+
+    future = asyncio.run_coroutine_threadsafe(
+        gemini_live_service.create_session(),
+        background_loop
+    )
+    future.add_done_callback(_on_session_created)
 
 @socketio.on('send_message')
 def handle_send_message(data):
@@ -452,64 +534,70 @@ def handle_send_message(data):
     message = data.get('message')
     frame = data.get('frame')
     client_sid = request.sid
-    logger.info(f"[LiveChat] Received send_message: session_id={session_id}, message={message[:30] if message else ''}, frame={'yes' if frame else 'no'}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[LiveChat] Received send_message: session_id=%s, message=%s, frame=%s",
+                     session_id, message[:30] if message else '', 'yes' if frame else 'no')
     if not session_id or not message:
         emit('error', {'message': 'session_id and message are required'}, room=client_sid)
         return
-    # Enqueue both text and frame as a tuple for a single user turn
+    # Enqueue both text and frame as a tuple for a single user turn; the
+    # coroutine emits from the background loop thread, so hand it the pump
     asyncio.run_coroutine_threadsafe(
-        gemini_live_service.process_user_message_socketio(session_id, (message, frame), client_sid, socketio),
+        gemini_live_service.process_user_message_socketio(session_id, (message, frame), client_sid, emitter),
         background_loop
     )
 
 @socketio.on('end_session')
 def handle_end_session(data):
-    try:
-        session_id = data.get('session_id')
-        
-        if not session_id:
-            emit('error', {'message': 'session_id is required'}, room=request.sid)
-            return
-        
-        # Schedule the coroutine in the background loop
-        future = asyncio.run_coroutine_threadsafe(
-            gemini_live_service.end_session(session_id),
-            background_loop
-        )
-        # Wait for the result
-        future.result(timeout=10)
-        logger.info(f"Ended session with ID: {session_id}")
-        emit('session_ended', {'session_id': session_id}, room=request.sid)
-    except Exception as e:
-        logger.error(f"Error ending session: {e}")
-        emit('error', {'message': f"Error ending session: {str(e)}"}, room=request.sid)
+    client_sid = request.sid
+    session_id = data.get('session_id')
+
+    if not session_id:
+        emit('error', {'message': 'session_id is required'}, room=client_sid)
+        return
+
+    def _on_session_ended(future):
+        # Runs on the background loop thread, so emit through the pump
+        try:
+            future.result()
+            logger.info(f"Ended session with ID: {session_id}")
+            emitter.emit('session_ended', {'session_id': session_id}, room=client_sid)
+        except Exception as e:
+            logger.error(f"Error ending session: {e}")
+            emitter.emit('error', {'message': f"Error ending session: {str(e)}"}, room=client_sid)
+
+    # Schedule the coroutine in the background loop without blocking on it
+    future = asyncio.run_coroutine_threadsafe(
+        gemini_live_service.end_session(session_id),
+        background_loop
+    )
+    future.add_done_callback(_on_session_ended)
 
 # Helper function to process user messages and emit responses via Socket.IO
 def _schedule_process_user_message_socketio(session_id, message, client_sid):
     try:
-        # Schedule the task in the asyncio event loop
-        future = asyncio.run_coroutine_threadsafe(
-            gemini_live_service.process_user_message_socketio(session_id, message, client_sid, socketio),
+        # Schedule the task in the asyncio event loop; responses are emitted
+        # from the coroutine itself, so there is no need to block on the future
+        asyncio.run_coroutine_threadsafe(
+            gemini_live_service.process_user_message_socketio(session_id, message, client_sid, emitter),
             background_loop
         )
-        # Wait for the result (optional)
-        result = future.result(timeout=30)
-        return result
     except Exception as e:
         logger.error(f"Error scheduling message processing: {e}")
-        socketio.emit('error', {'message': f"Error processing message: {str(e)}"}, room=client_sid)
+        emitter.emit('error', {'message': f"Error processing message: {str(e)}"}, room=client_sid)
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
-    logger.info(f"[Live2] handle_video_frame event received: {data}")
     session_id = data.get('session_id')
     frame_data_url = data.get('frame')
     if not session_id or not frame_data_url:
         emit('error', {'message': 'session_id and frame are required'}, room=request.sid)
         return
     gemini_live2_service.handle_video_frame(session_id, frame_data_url)
-    logger.info(f"[Live2] Received video frame for session {session_id}, length={len(frame_data_url)} (default namespace)")
-    # Optionally emit an ack or status
+    gemini_live2_service.queue_frame_ack(session_id, {'status': 'received'})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[Live2] Received video frame for session %s, length=%d (default namespace)",
+                     session_id, len(frame_data_url))
 
 @socketio.on('video_feed_stopped')
 def handle_video_feed_stopped(data):
@@ -521,8 +609,23 @@ def handle_video_feed_stopped(data):
     logger.info(f"[Live2] Cleared video frame queue for session {session_id} (video_feed_stopped event)")
     emit('video_queue_cleared', {'session_id': session_id}, room=request.sid)
 
+# Background task that coalesces per-frame acks into one batched emit every
+# ~20 ms, instead of one small Socket.IO frame per video frame.
+def _drain_frame_acks(session_id, client_sid):
+    while True:
+        session = gemini_live2_service.sessions.get(session_id)
+        if not session or not session["active"]:
+            break
+        socketio.sleep(0.02)
+        acks = gemini_live2_service.drain_frame_acks(session_id)
+        if acks:
+            socketio.emit('frames_ack', {'session_id': session_id, 'acks': acks},
+                          room=client_sid, namespace='/live2')
+
 class Live2Namespace(Namespace):
     def on_connect(self):
+        if emitter is not socketio:
+            emitter.start()
         logger.info(f"[Live2] Client connected: {request.sid}")
         emit('status', {'message': 'Connected to Live2'}, room=request.sid)
 
@@ -533,13 +636,21 @@ class Live2Namespace(Namespace):
     def on_start_live2_session(self, data=None):
         # Start a new Gemini Live2 session
         session_id = gemini_live2_service.create_session()
-        gemini_live2_service.set_socketio(session_id, socketio, request.sid)
+        # The service emits from the background loop and the b64 executor
+        # thread, so it gets the pump rather than socketio itself
+        gemini_live2_service.set_socketio(session_id, emitter, request.sid)
+        # Clients that can handle raw ArrayBuffer audio opt in at handshake;
+        # legacy clients keep receiving base64.
+        if data and data.get('binary_audio'):
+            gemini_live2_service.sessions[session_id]["binary_audio"] = True
         # Start async streaming in background loop
         future = asyncio.run_coroutine_threadsafe(
             gemini_live2_service.process_streaming(session_id),
             background_loop
         )
         gemini_live2_service.sessions[session_id]["stream_task"] = future
+        gemini_live2_service.sessions[session_id]["ack_drain_active"] = True
+        socketio.start_background_task(_drain_frame_acks, session_id, request.sid)
         logger.info(f"[Live2] Started session {session_id} for client {request.sid}")
         emit('live2_session_started', {'session_id': session_id}, room=request.sid)
 
@@ -547,15 +658,21 @@ class Live2Namespace(Namespace):
         # Receive audio chunk from client and forward to Gemini
         import base64
         session_id = data.get('session_id')
-        audio_b64 = data.get('audio')
-        if not session_id or not audio_b64:
+        audio = data.get('audio')
+        if not session_id or not audio:
             emit('error', {'message': 'session_id and audio are required'}, room=request.sid)
             return
-        try:
-            pcm_bytes = base64.b64decode(audio_b64)
-        except Exception as e:
-            emit('error', {'message': f'Invalid audio encoding: {e}'}, room=request.sid)
-            return
+        # Preferred path: raw binary PCM (Socket.IO sends bytes as binary
+        # attachments, avoiding the 33% base64 inflation and the decode cost).
+        if isinstance(audio, (bytes, bytearray)):
+            pcm_bytes = bytes(audio)
+        else:
+            # Legacy clients still send base64-encoded audio
+            try:
+                pcm_bytes = base64.b64decode(audio)
+            except Exception as e:
+                emit('error', {'message': f'Invalid audio encoding: {e}'}, room=request.sid)
+                return
         gemini_live2_service.handle_audio_chunk(session_id, pcm_bytes)
         emit('live2_audio_ack', {'status': 'received'}, room=request.sid)
 
@@ -567,8 +684,10 @@ class Live2Namespace(Namespace):
             emit('error', {'message': 'session_id and frame are required'}, room=request.sid)
             return
         gemini_live2_service.handle_video_frame(session_id, frame_data_url)
-        logger.info(f"[Live2] Received video frame for session {session_id}, length={len(frame_data_url)}")
-        # Optionally emit an ack or status
+        gemini_live2_service.queue_frame_ack(session_id, {'status': 'received'})
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[Live2] Received video frame for session %s, length=%d",
+                         session_id, len(frame_data_url))
 
     def on_end_live2_session(self, data):
         session_id = data.get('session_id')
@@ -579,10 +698,12 @@ class Live2Namespace(Namespace):
 # Register the namespace
 socketio.on_namespace(Live2Namespace('/live2'))
 
-# Example: log all incoming HTTP requests
+# Example: log all incoming HTTP requests. Note: request.form is deliberately
+# not logged — accessing it forces form parsing on every request.
 @app.before_request
 def log_request_info():
-    logger.info(f"HTTP {request.method} {request.path} - args: {request.args} - form: {request.form}")
+    logger.info("HTTP %s %s - args: %s - content_length: %s",
+                request.method, request.path, request.args, request.content_length)
 
 # Example: log unhandled exceptions
 def log_exception(sender, exception, **extra):
@@ -625,7 +746,9 @@ def check_assets():
 def handle_send_video_frame(data):
     session_id = data.get('session_id')
     frame_data_url = data.get('frame')
-    logger.info(f"[LiveChat] Received video frame for session {session_id}, length={len(frame_data_url) if frame_data_url else 0}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[LiveChat] Received video frame for session %s, length=%d",
+                     session_id, len(frame_data_url) if frame_data_url else 0)
     if not session_id or not frame_data_url:
         emit('error', {'message': 'session_id and frame are required'}, room=request.sid)
         return
@@ -633,7 +756,5 @@ def handle_send_video_frame(data):
     gemini_live_service.handle_video_frame(session_id, frame_data_url)
 
 if __name__ == '__main__':
-    print("Starting Flask-SocketIO server...")
-    import eventlet
-    import eventlet.wsgi
+    print(f"Starting Flask-SocketIO server (async_mode={ASYNC_MODE})...")
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
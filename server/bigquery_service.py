@@ -4,13 +4,18 @@ import re
 import logging
 from functools import lru_cache
 
+# Module-level cache of product info keyed by (project, dataset, product id) so
+# repeated search results skip BigQuery entirely, even across service instances.
+_PRODUCT_INFO_CACHE = {}
+_PRODUCT_INFO_CACHE_MAX = 4096
+
 class BigQueryService:
     def __init__(self, project_id, dataset):
         self.project_id = project_id
         self.dataset = dataset
         self.client = bigquery.Client(project=project_id)
         self.storage_client = storage.Client(project=project_id)
-        
+
     def get_signed_urls(self, urls):
         """Get signed URLs for GCS images"""
         # Convert the list of URIs into a string for the IN clause
@@ -32,24 +37,42 @@ class BigQueryService:
         """Get product information - only aisle information is available"""
         # Convert product IDs to integers
         product_id_list = [int(pid) for pid in product_ids]
-        
+
+        # Serve previously-seen product IDs from the in-memory cache and only
+        # query BigQuery for the IDs we have not resolved before.
+        cache_prefix = (self.project_id, self.dataset)
+        product_info = []
+        missing_ids = []
+        for pid in product_id_list:
+            cached = _PRODUCT_INFO_CACHE.get(cache_prefix + (pid,))
+            if cached is not None:
+                product_info.append(cached)
+            else:
+                missing_ids.append(pid)
+
+        if not missing_ids:
+            return product_info
+
         query = f"""
-        SELECT p.productid, 
+        SELECT p.productid,
                p.aisle
         FROM `{self.project_id}.{self.dataset}.product_qty` p
-        WHERE p.productid IN ({','.join(map(str, product_id_list))})
+        WHERE p.productid IN ({','.join(map(str, missing_ids))})
         """
-        
+
         query_job = self.client.query(query)
         results = query_job.result()
-        
-        product_info = []
+
         for row in results:
-            product_info.append({
+            info = {
                 'productid': row.productid,
                 'aisle': row.aisle
-            })
-            
+            }
+            product_info.append(info)
+            if len(_PRODUCT_INFO_CACHE) >= _PRODUCT_INFO_CACHE_MAX:
+                _PRODUCT_INFO_CACHE.clear()
+            _PRODUCT_INFO_CACHE[cache_prefix + (row.productid,)] = info
+
         return product_info
         
     def search_products(self, embeddings, k=5):
@@ -1,14 +1,103 @@
+import io
 import os
+import time
 import logging
 import uuid
 import asyncio
+import collections
+from PIL import Image as PILImage
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from dotenv import load_dotenv
+import google.genai as genai
+from google.genai import types
 from gemini_tool_definitions import SEARCH_PRODUCTS_TOOL
-from utils import normalize_product
+from utils import normalize_product, b64decode, b64encode_str
 
 # Load environment variables
 load_dotenv()
 
+# Outbound audio coalescing: flush window and max buffered bytes before a
+# forced flush (bounds added latency under bursty Gemini audio).
+AUDIO_FLUSH_DELAY = 0.015
+AUDIO_BUF_MAX = 64 * 1024
+
+# Frames larger than this are downscaled before upload — Gemini's vision
+# tower gains nothing beyond ~768 px on the longest side
+FRAME_DOWNSCALE_BYTES = 256 * 1024
+FRAME_MAX_DIM = 768
+
+# A connection that streamed at least this long counts as healthy, resetting
+# the reconnect backoff streak
+HEALTHY_STREAM_SECS = 30.0
+
+
+class _SPSCRing:
+    """Single-producer/single-consumer ring for the audio→Gemini hand-off.
+
+    asyncio.Queue allocates a Future per blocking get; for the strict
+    one-producer (Socket.IO thread via call_soon_threadsafe) to one-consumer
+    (_send_to_gemini) audio flow, a plain ring with head/tail counters and a
+    single reused asyncio.Event is lighter. All state is mutated on the
+    event loop thread, so no locking is needed. Capacity must be a power of
+    two; mimics the asyncio.Queue surface the callers already use.
+    """
+    __slots__ = ("_buf", "_mask", "_head", "_tail", "_event")
+
+    def __init__(self, capacity=32):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self._buf = [None] * capacity
+        self._mask = capacity - 1
+        self._head = 0  # next slot to read
+        self._tail = 0  # next slot to write
+        self._event = asyncio.Event()
+
+    def put_nowait(self, item):
+        if self.full():
+            # Drop oldest: freshness beats completeness for live audio
+            self._buf[self._head & self._mask] = None
+            self._head += 1
+        self._buf[self._tail & self._mask] = item
+        self._tail += 1
+        self._event.set()
+
+    def get_nowait(self):
+        if self._head == self._tail:
+            raise asyncio.QueueEmpty
+        idx = self._head & self._mask
+        item = self._buf[idx]
+        self._buf[idx] = None
+        self._head += 1
+        return item
+
+    async def get(self):
+        while self._head == self._tail:
+            self._event.clear()
+            await self._event.wait()
+        return self.get_nowait()
+
+    def empty(self):
+        return self._head == self._tail
+
+    def full(self):
+        return self._tail - self._head > self._mask
+
+    def qsize(self):
+        return self._tail - self._head
+
+
+@dataclass(slots=True)
+class Live2Emit:
+    """Pooled record staging one Socket.IO emission (event name + payload).
+
+    slots=True keeps the instance dict-free; rented/returned via the pool in
+    GeminiLive2Service so the hot emit path reuses records instead of
+    allocating per response.
+    """
+    event: str = ""
+    payload: dict = None
+
 class GeminiLive2Service:
     """
     Modular service for Gemini Live2 (audio, video, VAD, camera, etc.).
@@ -26,18 +115,52 @@ class GeminiLive2Service:
         self.system_instruction = os.getenv("GEMINI_LIVE_INSTRUCTIONS", "You are an intelligent assistant that helps users find products, answer questions, and provide helpful information. You can search for products when asked. When responding with audio, keep your responses concise and natural.")
         self.tools = [SEARCH_PRODUCTS_TOOL]
         self.loop = loop
+        # Batched emission is the default; LIVE2_LEGACY_EMITS=1 restores the
+        # one-event-per-response-part behaviour for rollback.
+        self.legacy_emits = os.getenv("LIVE2_LEGACY_EMITS", "0") == "1"
+        # Single worker keeps flushed audio segments in order while moving
+        # the base64 encode (pure CPU) off the event loop thread.
+        self._emit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live2-b64")
+        # One shared client: connection pools and auth state are reused
+        # across sessions instead of rebuilt per process_streaming call.
+        self._genai_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        # Reusable Live2Emit records for the emit path (bounded pool)
+        self._emit_pool = collections.deque()
+        # Connect config is session-independent: build its object graph once
+        self._connect_config = types.LiveConnectConfig(
+            system_instruction=types.Content(parts=[types.Part(text=self.system_instruction)]),
+            response_modalities=["AUDIO", "TEXT"],
+            tools=self.tools,
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Kore")
+                ),
+                language_code='en-US',
+            ),
+            output_audio_transcription=types.AudioTranscriptionConfig(),
+        )
         logging.info(f"[Live2] Using Gemini model: {self.model_name}")
         # Add any additional config as needed
 
     def create_session(self):
         session_id = str(uuid.uuid4())
         self.sessions[session_id] = {
-            "audio": [],
             "active": True,
-            "out_queue": asyncio.Queue(maxsize=10),
+            "out_queue": _SPSCRing(32),
             "socketio": None,
             "client_sid": None,
             "stream_task": None,
+            # Bounded: acks are droppable status packets, and a stuck drainer
+            # must not grow the deque without limit
+            "pending_emits": collections.deque(maxlen=256),
+            "ack_drain_active": False,
+            "frames_received": 0,
+            "audio_buf": [],
+            "audio_buf_size": 0,
+            "audio_flush_handle": None,
+            "out_drops": 0,
+            "binary_audio": False,
+            "chunk_count": 0,
         }
         logging.info(f"[Live2] Created session {session_id}")
         return session_id
@@ -47,93 +170,272 @@ class GeminiLive2Service:
             self.sessions[session_id]["socketio"] = socketio
             self.sessions[session_id]["client_sid"] = client_sid
 
+    def queue_frame_ack(self, session_id, payload):
+        """Queue a per-frame ack payload for batched emission instead of emitting inline.
+
+        Acks are only queued once a drain task is running: sessions created
+        over REST never start one, and their deque would otherwise just
+        accumulate. Each payload is stamped with the session's frame counter
+        so the batched acks are correlatable client-side.
+        """
+        session = self.sessions.get(session_id)
+        if not session or not session["active"]:
+            return
+        session["frames_received"] += 1
+        if not session["ack_drain_active"]:
+            return
+        session["pending_emits"].append(dict(payload, frame=session["frames_received"]))
+
+    def drain_frame_acks(self, session_id):
+        """Drain and return all pending ack payloads for a session."""
+        session = self.sessions.get(session_id)
+        if not session:
+            return []
+        pending = session["pending_emits"]
+        acks = []
+        while pending:
+            acks.append(pending.popleft())
+        return acks
+
     async def process_streaming(self, session_id):
         """
-        Async task: reads audio and video from out_queue, streams to Gemini, emits responses.
-        Modular: audio and video streaming are independent.
+        Supervisor task: connects to Gemini and runs one streaming attempt at
+        a time, reconnecting with exponential backoff while the session is
+        active. Modular: audio and video streaming are independent.
         """
-        import google.genai as genai
-        from google.genai import types
         logger = logging.getLogger(__name__)
         logger.info(f"[Live2] process_streaming started for session {session_id}")
-        try:
-            session = self.sessions[session_id]
-            model = self.model_name
-            api_key = os.getenv("GEMINI_API_KEY")
-            client = genai.Client(api_key=api_key)
-            config = types.LiveConnectConfig(
-                system_instruction=types.Content(parts=[types.Part(text=self.system_instruction)]),
-                response_modalities=["AUDIO", "TEXT"],
-                tools=self.tools,
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Kore")
-                    ),
-                    language_code='en-US',
-                ),
-                output_audio_transcription=types.AudioTranscriptionConfig(),
-            )
-            logger.info(f"[Live2] Using Gemini model: {model} with config: {config}")
-            async with client.aio.live.connect(model=model, config=config) as gemini_session:
-                session["gemini_session"] = gemini_session
-                socketio = session["socketio"]
-                client_sid = session["client_sid"]
-                # Notify frontend Gemini session is ready for video frames
-                if socketio and client_sid:
-                    socketio.emit('live2_session_ready', {'session_id': session_id}, room=client_sid, namespace="/live2")
-                # Start sender in parallel
-                sender_task = asyncio.create_task(self._send_to_gemini(session_id, gemini_session))
-                while session["active"]:
-                    try:
-                        # --- RECEIVE RESPONSES ---
-                        logger.info(f"[Live2] Entering Gemini receive loop for session {session_id}")
-                        async for response in gemini_session.receive():
-                            try:
-                                # Handle function/tool call
-                                if hasattr(response, 'tool_call') and response.tool_call:
-                                    function_call_details = response.tool_call.function_calls[0]
-                                    function_name = function_call_details.name
-                                    function_args = dict(function_call_details.args)
-                                    logger.info(f"[Live2] Function call: {function_name} with args {function_args}")
-                                    if function_name == "search_products":
-                                        query = function_args.get("query", "")
-                                        product = normalize_product({"id": "1", "name": f"Result for {query}"}, query=query)
-                                        results = [product]
-                                        if socketio and client_sid:
-                                            socketio.emit('live2_message', {"text": f"Function result: {results}", "sender": "Gemini", "function_name": function_name, "results": results}, room=client_sid, namespace="/live2")
-                                # Handle text response
-                                if hasattr(response, 'text') and response.text:
-                                    logger.info(f"[Live2] Emitting text response to client: {response.text}")
-                                    if socketio and client_sid:
-                                        socketio.emit('live2_message', {"text": response.text, "sender": "Gemini"}, room=client_sid, namespace="/live2")
-                                # Handle audio response
-                                if hasattr(response, 'audio') and response.audio:
-                                    logger.info(f"[Live2] Emitting audio response to client, size={len(response.audio)} bytes")
-                                    import base64
-                                    audio_b64 = base64.b64encode(response.audio).decode('utf-8')
-                                    if socketio and client_sid:
-                                        socketio.emit('live2_audio', {"audio": audio_b64}, room=client_sid, namespace="/live2")
-                                # (Optional) Handle transcription
-                                if hasattr(response, 'output_transcription') and response.output_transcription:
-                                    logger.info(f"[Live2] Emitting output transcription: {response.output_transcription.text}")
-                                    if socketio and client_sid:
-                                        socketio.emit('live2_message', {"text": response.output_transcription.text, "sender": "Gemini", "transcription": True}, room=client_sid, namespace="/live2")
-                                if hasattr(response, 'input_transcription') and response.input_transcription:
-                                    logger.info(f"[Live2] Emitting input transcription: {response.input_transcription.text}")
-                                    if socketio and client_sid:
-                                        socketio.emit('live2_message', {"text": response.input_transcription.text, "sender": "User", "transcription": True}, room=client_sid, namespace="/live2")
-                            except Exception as emit_err:
-                                logger.error(f"[Live2] Error emitting Gemini response: {emit_err}")
-                    except Exception as e:
-                        logger.error(f"[Live2] Error in streaming loop: {e}")
-                # Cancel sender when session ends
+        session = self.sessions.get(session_id)
+        if not session:
+            return
+        attempt = 0
+        while session["active"]:
+            started = time.monotonic()
+            try:
+                await self._stream_once(session_id, session, logger)
+                if not session["active"]:
+                    break
+                # receive() exhausted with the session still active: the
+                # transport dropped; fall through to reconnect
+                logger.warning(f"[Live2] Gemini stream ended for active session {session_id}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not session["active"]:
+                    break
+                logger.error(f"[Live2] Exception in process_streaming for session {session_id}: {e}", exc_info=True)
+            # A connection that streamed for a while was healthy: forget the
+            # old failure streak so a later transient drop retries quickly
+            # instead of waiting out the full capped backoff
+            if time.monotonic() - started >= HEALTHY_STREAM_SECS:
+                attempt = 0
+            attempt += 1
+            delay = min(2 ** attempt, 30)
+            logger.info(f"[Live2] Reconnecting session {session_id} in {delay}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+    async def _stream_once(self, session_id, session, logger):
+        """One Gemini connection lifecycle: connect, pump, clean up workers."""
+        model = self.model_name
+        client = self._genai_client
+        config = self._connect_config
+        logger.info(f"[Live2] Using Gemini model: {model}")
+        async with client.aio.live.connect(model=model, config=config) as gemini_session:
+            session["gemini_session"] = gemini_session
+            socketio = session["socketio"]
+            client_sid = session["client_sid"]
+            # Notify frontend Gemini session is ready for video frames
+            if socketio and client_sid:
+                socketio.emit('live2_session_ready', {'session_id': session_id}, room=client_sid, namespace="/live2")
+            # Start the sender: one ordered stream carries audio and video
+            sender_task = asyncio.create_task(self._send_to_gemini(session_id, gemini_session))
+            logger.info(f"[Live2] Entering Gemini receive loop for session {session_id}")
+            try:
+                # Single pass: receive() yields until the connection ends,
+                # so no outer retry loop is needed here. Handler/transport
+                # errors bubble to the supervisor (which backs off); only
+                # emit failures are absorbed, since a gone client must not
+                # kill the Gemini stream.
+                async for response in gemini_session.receive():
+                    # Collect all parts of this response via the
+                    # dispatch table, then emit once
+                    parts = []
+                    for attr, handler in self._HANDLERS.items():
+                        val = getattr(response, attr, None)
+                        if val:
+                            handler(self, session_id, val, parts)
+                    if parts and socketio and client_sid:
+                        try:
+                            self._emit_parts(socketio, client_sid, parts)
+                        except asyncio.CancelledError:
+                            raise
+                        except Exception as emit_err:
+                            logger.error(f"[Live2] Error emitting Gemini response: {emit_err}")
+            finally:
+                # Flush any buffered audio, then cancel the sender
+                self._flush_audio(session_id)
                 sender_task.cancel()
                 try:
                     await sender_task
                 except Exception:
                     pass
+
+    # --- Per-response part handlers (dispatched from the receive loop) ---
+
+    def _handle_tool_call(self, session_id, tool_call, parts):
+        function_call_details = tool_call.function_calls[0]
+        function_name = function_call_details.name
+        function_args = dict(function_call_details.args)
+        logging.info("[Live2] Function call: %s with args %s", function_name, function_args)
+        if function_name == "search_products":
+            query = function_args.get("query", "")
+            product = normalize_product({"id": "1", "name": f"Result for {query}"}, query=query)
+            parts.append({"kind": "tool", "name": function_name, "results": [product]})
+
+    def _handle_text(self, session_id, text, parts):
+        parts.append({"kind": "text", "text": text})
+
+    def _handle_audio(self, session_id, audio, parts):
+        # Audio bypasses parts: it is coalesced into timed flushes
+        self._buffer_audio(session_id, audio)
+
+    def _handle_output_transcription(self, session_id, transcription, parts):
+        parts.append({"kind": "transcription", "text": transcription.text, "sender": "Gemini"})
+
+    def _handle_input_transcription(self, session_id, transcription, parts):
+        parts.append({"kind": "transcription", "text": transcription.text, "sender": "User"})
+
+    # Single getattr per attribute instead of hasattr's exception machinery;
+    # iteration order matches the original branch order.
+    _HANDLERS = {
+        "tool_call": _handle_tool_call,
+        "text": _handle_text,
+        "audio": _handle_audio,
+        "output_transcription": _handle_output_transcription,
+        "input_transcription": _handle_input_transcription,
+    }
+
+    def _buffer_audio(self, session_id, audio_bytes):
+        """Buffer an outbound audio chunk, flushing after a short window.
+
+        Runs on the event loop thread (receive loop). Consecutive Gemini
+        audio chunks inside the window are concatenated and emitted as one
+        'live2_audio' event, so a 20ms chunk cadence no longer means one WS
+        frame (plus one base64 encode) per chunk.
+        """
+        session = self.sessions.get(session_id)
+        if not session:
+            return
+        session["audio_buf"].append(audio_bytes)
+        session["audio_buf_size"] += len(audio_bytes)
+        if session["audio_buf_size"] >= AUDIO_BUF_MAX:
+            self._flush_audio(session_id)
+        elif session["audio_flush_handle"] is None:
+            session["audio_flush_handle"] = asyncio.get_running_loop().call_later(
+                AUDIO_FLUSH_DELAY, self._flush_audio, session_id
+            )
+
+    def _flush_audio(self, session_id):
+        """Emit all buffered audio for a session as a single event."""
+        session = self.sessions.get(session_id)
+        if not session:
+            return
+        handle = session["audio_flush_handle"]
+        if handle is not None:
+            handle.cancel()
+            session["audio_flush_handle"] = None
+        buf = session["audio_buf"]
+        if not buf:
+            return
+        segments = len(buf)
+        joined = b"".join(buf)
+        buf.clear()
+        session["audio_buf_size"] = 0
+        socketio = session["socketio"]
+        client_sid = session["client_sid"]
+        if socketio and client_sid:
+            if session["binary_audio"]:
+                # Raw bytes go out as a binary attachment: no encode pass,
+                # no 33% base64 inflation on the wire.
+                socketio.emit('live2_audio', {"audio": joined, "segments": segments}, room=client_sid, namespace="/live2")
+            else:
+                self._emit_executor.submit(self._encode_and_emit, socketio, client_sid, joined, segments)
+
+    @staticmethod
+    def _encode_and_emit(socketio, client_sid, joined, segments):
+        """base64-encode a flushed audio buffer and emit it (executor thread)."""
+        try:
+            audio_b64 = b64encode_str(joined)
+            socketio.emit('live2_audio', {"audio": audio_b64, "segments": segments}, room=client_sid, namespace="/live2")
         except Exception as e:
-            logger.error(f"[Live2] Exception in process_streaming for session {session_id}: {e}", exc_info=True)
+            logging.error(f"[Live2] Error emitting coalesced audio: {e}")
+
+    async def _broadcast(self, socketio, event, payload, clients, batch=50):
+        """Emit an event to many clients, yielding the loop between batches.
+
+        A plain emit-per-client loop over hundreds of sids would starve the
+        receive loops sharing this event loop; slicing with an
+        `await asyncio.sleep(0)` between batches keeps latency bounded as
+        session count grows. Small client lists take the fast path with no
+        extra yields.
+        """
+        clients = list(clients)
+        if len(clients) <= batch:
+            for sid in clients:
+                socketio.emit(event, payload, room=sid, namespace="/live2")
+            return
+        for i in range(0, len(clients), batch):
+            for sid in clients[i:i + batch]:
+                socketio.emit(event, payload, room=sid, namespace="/live2")
+            await asyncio.sleep(0)
+
+    def _emit_parts(self, socketio, client_sid, parts):
+        """Emit the collected parts of one Gemini response to the client.
+
+        Default: a single batched 'live2_multi' event per response. With
+        LIVE2_LEGACY_EMITS=1, replays the original one-event-per-part
+        behaviour ('live2_message' / 'live2_audio') for rollback.
+        """
+        rec = self._rent_emit()
+        try:
+            if not self.legacy_emits:
+                rec.event = 'live2_multi'
+                rec.payload = {"parts": parts}
+                socketio.emit(rec.event, rec.payload, room=client_sid, namespace="/live2")
+                return
+            for part in parts:
+                kind = part["kind"]
+                if kind == "tool":
+                    rec.event = 'live2_message'
+                    rec.payload = {"text": f"Function result: {part['results']}", "sender": "Gemini", "function_name": part["name"], "results": part["results"]}
+                elif kind == "text":
+                    rec.event = 'live2_message'
+                    rec.payload = {"text": part["text"], "sender": "Gemini"}
+                elif kind == "audio":
+                    rec.event = 'live2_audio'
+                    rec.payload = {"audio": part["audio_b64"]}
+                elif kind == "transcription":
+                    rec.event = 'live2_message'
+                    rec.payload = {"text": part["text"], "sender": part["sender"], "transcription": True}
+                else:
+                    continue
+                socketio.emit(rec.event, rec.payload, room=client_sid, namespace="/live2")
+        finally:
+            self._return_emit(rec)
+
+    def _rent_emit(self):
+        """Pop a Live2Emit from the pool, or allocate on a cold pool."""
+        try:
+            return self._emit_pool.pop()
+        except IndexError:
+            return Live2Emit()
+
+    def _return_emit(self, rec):
+        """Reset a Live2Emit and return it to the (bounded) pool."""
+        rec.event = ""
+        rec.payload = None
+        if len(self._emit_pool) < 32:
+            self._emit_pool.append(rec)
 
     def handle_audio_chunk(self, session_id, pcm_bytes):
         """
@@ -141,59 +443,179 @@ class GeminiLive2Service:
         Modular: does not affect video or other chat modes.
         """
         if session_id not in self.sessions or not self.sessions[session_id]["active"]:
-            logging.warning(f"[Live2] Invalid or inactive session: {session_id}")
+            logging.warning("[Live2] Invalid or inactive session: %s", session_id)
             return {"error": "Invalid session"}
         session = self.sessions[session_id]
+        # Per-chunk logging at INFO is ~100 lines/s per session; keep the
+        # detail at DEBUG and log a 1-in-100 sampled INFO heartbeat.
+        session["chunk_count"] += 1
+        if session["chunk_count"] % 100 == 0:
+            logging.info("[Live2] Session %s: %d audio chunks received", session_id, session['chunk_count'])
+        elif logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("[Live2] Received audio chunk for session %s, size=%d bytes", session_id, len(pcm_bytes))
         if "out_queue" in session:
-            logging.info(f"[Live2] Putting audio chunk in out_queue for session {session_id}, size={len(pcm_bytes)} bytes, type={type(pcm_bytes)}")
             try:
                 if self.loop:
-                    asyncio.run_coroutine_threadsafe(session["out_queue"].put({"data": pcm_bytes, "mime_type": "audio/pcm"}), self.loop)
+                    # put_nowait with drop-oldest: a full queue never blocks
+                    # the Socket.IO handler thread, and stale audio is
+                    # dropped rather than adding latency.
+                    self.loop.call_soon_threadsafe(
+                        self._enqueue_out, session_id,
+                        {"data": pcm_bytes, "mime_type": "audio/pcm"}
+                    )
                 else:
                     logging.error("[Live2] No event loop set for GeminiLive2Service!")
             except Exception as e:
                 logging.error(f"[Live2] Error putting audio in out_queue: {e}")
-        session["audio"].append(pcm_bytes)
-        logging.info(f"[Live2] Received audio chunk for session {session_id}, size={len(pcm_bytes)} bytes")
         return {"status": "audio chunk received"}
 
+    def _enqueue_out(self, session_id, item):
+        """Enqueue an outbound item, dropping the oldest when out_queue is full.
+
+        Runs on the event loop thread via call_soon_threadsafe. Drops are
+        counted per session and surfaced every 100 so a slow Gemini link is
+        visible without per-drop log spam.
+        """
+        session = self.sessions.get(session_id)
+        if not session or not session["active"]:
+            return
+        queue = session["out_queue"]
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            session["out_drops"] += 1
+            if session["out_drops"] % 100 == 0:
+                logging.warning(f"[Live2] Dropped {session['out_drops']} stale outbound items for session {session_id} (Gemini send lagging)")
+        queue.put_nowait(item)
+
     def handle_video_frame(self, session_id, frame_data_url):
         if session_id not in self.sessions or not self.sessions[session_id]["active"]:
-            logging.warning(f"[Live2] Invalid or inactive session for video: {session_id}")
+            logging.warning("[Live2] Invalid or inactive session for video: %s", session_id)
             return {"error": "Invalid session"}
         session = self.sessions[session_id]
-        # Direct-send: send frame to Gemini session immediately if available
-        if "gemini_session" in session and session["gemini_session"]:
-            try:
-                if self.loop:
-                    header, encoded = frame_data_url.split(",", 1)
-                    frame_bytes = base64.b64decode(encoded)
-                    asyncio.run_coroutine_threadsafe(
-                        session["gemini_session"].send(
-                            input={"data": frame_bytes, "mime_type": "image/jpeg"},
-                            end_of_turn=False
-                        ),
-                        self.loop
-                    )
-                    logging.info(f"[Live2] Direct-sent video frame to Gemini for session {session_id}, size={len(frame_bytes)} bytes")
-                else:
-                    logging.error("[Live2] No event loop set for GeminiLive2Service!")
-            except Exception as e:
-                logging.error(f"[Live2] Error direct-sending video frame to Gemini: {e}")
+        if not self.loop:
+            logging.error("[Live2] No event loop set for GeminiLive2Service!")
+            return {"error": "No event loop"}
+        try:
+            # Frames share out_queue with audio so Gemini sees one ordered
+            # stream — no race between a frame and the audio narrating it.
+            # Data URLs stay encoded until the sender decodes them in the
+            # executor; raw JPEG bytes (binary uploads) pass straight
+            # through. Drop-oldest keeps memory bounded and frames fresh
+            # when the camera outpaces Gemini.
+            if isinstance(frame_data_url, (bytes, bytearray)):
+                item = {"data": bytes(frame_data_url), "mime_type": "image/jpeg"}
+            else:
+                item = {"data_url": frame_data_url}
+            self.loop.call_soon_threadsafe(self._enqueue_out, session_id, item)
+        except Exception as e:
+            logging.error(f"[Live2] Error queueing video frame for session {session_id}: {e}")
+            return {"error": str(e)}
+        return {"status": "video frame queued"}
+
+    @staticmethod
+    def _decode_frame_data_url(frame_data_url):
+        """Decode a data:image/...;base64, URL into (bytes, mime_type).
+
+        Uses str.partition plus the shared b64decode (pybase64 when
+        installed) instead of split + stdlib base64, and is only called on
+        the consumer side just before upload. Oversized frames are
+        downscaled to FRAME_MAX_DIM so upload bytes and vision tokenization
+        scale with what the model can actually use.
+        """
+        header, sep, encoded = frame_data_url.partition(",")
+        if not sep:
+            encoded = frame_data_url
+            mime_type = "image/jpeg"
         else:
-            logging.warning(f"[Live2] No active Gemini session for video frame in session {session_id}")
-        return {"status": "video frame sent"}
+            mime_type = "image/jpeg"
+            colon = header.find(":")
+            semi = header.find(";")
+            if colon != -1 and semi != -1:
+                mime_type = header[colon + 1:semi]
+        frame_bytes = b64decode(encoded)
+        if len(frame_bytes) > FRAME_DOWNSCALE_BYTES:
+            img = PILImage.open(io.BytesIO(frame_bytes))
+            img.thumbnail((FRAME_MAX_DIM, FRAME_MAX_DIM))
+            buf = io.BytesIO()
+            img.convert("RGB").save(buf, format="JPEG", quality=80)
+            frame_bytes = buf.getvalue()
+            mime_type = "image/jpeg"
+        return frame_bytes, mime_type
+
+    @staticmethod
+    def _is_video_item(item):
+        return "data_url" in item or item.get("mime_type", "").startswith("image/")
+
+    def clear_video_queue(self, session_id):
+        """Drop any queued video frames for a session (video feed stopped)."""
+        session = self.sessions.get(session_id)
+        if not session or not self.loop:
+            return
+
+        def _drop_video(queue):
+            kept = []
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if not self._is_video_item(item):
+                    kept.append(item)
+            for item in kept:
+                queue.put_nowait(item)
+
+        self.loop.call_soon_threadsafe(_drop_video, session["out_queue"])
 
     async def _send_to_gemini(self, session_id, gemini_session):
         session = self.sessions[session_id]
+        queue = session["out_queue"]
+        loop = asyncio.get_running_loop()
         while session["active"]:
             try:
-                item = await session["out_queue"].get()
+                # Block for the first item, then drain whatever else is
+                # already queued (bounded) so a backlog of small PCM chunks
+                # becomes few sends instead of one send per chunk.
+                batch = [await queue.get()]
+                while len(batch) < 16:
+                    try:
+                        batch.append(queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
                 try:
-                    await gemini_session.send(input=item, end_of_turn=False)
-                    logging.info(f"[Live2] Sent {item['mime_type']} to Gemini for session {session_id}, size={len(item['data'])} bytes")
+                    # Decode any still-encoded video frames off the loop
+                    for k, queued in enumerate(batch):
+                        if "data_url" in queued:
+                            data, mime = await loop.run_in_executor(
+                                None, self._decode_frame_data_url, queued["data_url"]
+                            )
+                            batch[k] = {"data": data, "mime_type": mime}
+                    # Coalesce runs of equal audio mime type: raw PCM
+                    # concatenates cleanly; images are never joined
+                    i = 0
+                    n = len(batch)
+                    while i < n:
+                        mime = batch[i]["mime_type"]
+                        j = i + 1
+                        if mime.startswith("audio/"):
+                            while j < n and batch[j]["mime_type"] == mime:
+                                j += 1
+                        if j - i == 1:
+                            item = batch[i]
+                        else:
+                            item = {"data": b"".join(b["data"] for b in batch[i:j]), "mime_type": mime}
+                        await gemini_session.send(input=item, end_of_turn=False)
+                        if logging.getLogger().isEnabledFor(logging.DEBUG):
+                            logging.debug("[Live2] Sent %s to Gemini for session %s, size=%d bytes (%d coalesced)", mime, session_id, len(item['data']), j - i)
+                        i = j
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
                     logging.error(f"[Live2] Error sending to Gemini: {e}")
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logging.error(f"[Live2] Error in send_to_gemini loop: {e}")
                 await asyncio.sleep(1)
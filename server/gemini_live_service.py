@@ -1,20 +1,35 @@
+import io
 import os
+import re
 import json
+import time
 import asyncio
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 import logging
-import base64
 import uuid
 from google import genai
 from google.genai import types
 from google.genai.types import Tool, Part, Content, FunctionResponse
 from google.cloud import texttospeech
 import aiohttp
+import functools
 from dotenv import load_dotenv
 from gemini_tool_definitions import SEARCH_PRODUCTS_TOOL
+from search_service import search_products
 import websockets
 from dotenv import load_dotenv
 from gemini_tool_definitions import SEARCH_PRODUCTS_TOOL
-from utils import normalize_product
+from utils import normalize_products, summarize_products, b64decode, b64encode_str
+from PIL import Image as PILImage
+
+# orjson parses the small args dicts 2-3x faster than stdlib json
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +48,67 @@ if not GEMINI_API_KEY:
 # Use Client instead of configure for the newer API style
 genai_client = genai.Client(api_key=GEMINI_API_KEY, http_options={'api_version': 'v1beta'})
 
+# Loopback search endpoint (SEARCH_OVER_HTTP=1 fallback) and a sanity cap on
+# model-supplied query length
+SEARCH_URL = "http://localhost:5000/api/search"
+MAX_SEARCH_QUERY_LEN = 256
+
+# Frames larger than this are downscaled before being sent to Gemini — fewer
+# image bytes means fewer vision tokens to prefill per turn
+FRAME_DOWNSCALE_BYTES = 256 * 1024
+FRAME_MAX_DIM = 768
+
+# A staged frame older than this no longer reflects what the camera sees;
+# discard it rather than attach it to the next message
+FRAME_STALE_SECS = 5.0
+
+# Sentence boundary for streaming TTS, compiled once instead of per token
+_SENT_BOUNDARY_RE = re.compile(r'([.!?]+\s)')
+
+# Audio bytes per receive_audio_chunk emit: larger packets mean fewer
+# WebSocket frames and fewer serialize/syscall rounds per utterance
+TTS_EMIT_CHUNK = 16 * 1024
+
+
+class _SPSCQueue:
+    """Single-producer/single-consumer message queue.
+
+    Each session has exactly one producer (the Socket.IO handler) and one
+    consumer (the background task), so asyncio.Queue's waiter bookkeeping and
+    per-operation wakeup callbacks are pure overhead here. A deque plus one
+    Event covers the same put/get API. Bounded like the asyncio.Queue it
+    replaces, but overflow drops the oldest entry (with a warning) instead of
+    suspending the producer.
+    """
+
+    def __init__(self, maxsize=0):
+        self._items = deque()
+        self._event = asyncio.Event()
+        self._maxsize = maxsize
+
+    def put_nowait(self, item):
+        if self._maxsize and len(self._items) >= self._maxsize:
+            self._items.popleft()
+            logger.warning("Message queue full; dropped oldest entry")
+        self._items.append(item)
+        self._event.set()
+
+    async def put(self, item):
+        self.put_nowait(item)
+
+    async def get(self):
+        while not self._items:
+            self._event.clear()
+            await self._event.wait()
+        item = self._items.popleft()
+        if not self._items:
+            self._event.clear()
+        return item
+
+    def empty(self):
+        return not self._items
+
+
 class GeminiLiveService:
     def __init__(self, loop=None):
         """Initialize the Gemini Live Service with API clients and session management"""
@@ -84,12 +160,47 @@ class GeminiLiveService:
         
         # Session management
         self.active_sessions = {}
+
+        # Shared aiohttp session (lazy): one connection pool for all
+        # function-call searches instead of a TLS/TCP setup per call
+        self._http = None
+        self._http_lock = asyncio.Lock()
+
+        # LRU cache of synthesized audio: short assistant phrasings repeat
+        # across turns and sessions, and a hit skips the whole TTS RPC
+        self._tts_cache = OrderedDict()
+        self._tts_cache_max = 256
+        self._tts_cache_text_max = 512  # longer texts bypass the cache
+        self._tts_cache_lock = asyncio.Lock()
+
+        # synthesize_speech is a blocking gRPC call; running it here keeps
+        # the event loop free while sentences are synthesized
+        self._tts_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tts")
+
+        # base64 decode and JPEG downscale of >100 KB frames run here so the
+        # event loop never blocks on image work
+        self._img_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="img")
+
+        # Bounds the fan-out when one model response carries several tool
+        # calls; they run concurrently under this cap
+        self._tool_sem = asyncio.Semaphore(8)
+
+        # LRU cache of image Parts keyed by (frame hash, mime type):
+        # Part.from_bytes runs pydantic validation, which repeated frames can
+        # skip entirely
+        self._part_cache = OrderedDict()
+        self._part_cache_max = 32
         
         # Configure generation parameters from environment variables
         self.temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
         self.top_p = float(os.getenv("GEMINI_TOP_P", "0.95"))
         self.top_k = int(os.getenv("GEMINI_TOP_K", "40"))
         self.max_output_tokens = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048"))
+
+        # Streamed-chunk coalescing: flush response_chunk when this many
+        # characters have accumulated or this much time has passed
+        self.stream_batch_chars = int(os.getenv("STREAM_BATCH_CHARS", "64"))
+        self.stream_batch_secs = int(os.getenv("STREAM_BATCH_MS", "40")) / 1000.0
         
         # Configure tools for the Live API
         self.tools = [Tool(function_declarations=[SEARCH_PRODUCTS_TOOL])]
@@ -100,7 +211,18 @@ class GeminiLiveService:
             When responding with audio, keep your responses concise and natural."""
             
         self.system_instruction = os.getenv("GEMINI_LIVE_INSTRUCTIONS", default_instructions)
-        
+
+        # Live config is immutable after init: build it once instead of per
+        # session (saves the nested Content/Part construction and validation
+        # on every session start)
+        self._live_config = types.LiveConnectConfig(
+            system_instruction=Content(
+                parts=[Part(text=self.system_instruction)]
+            ),
+            response_modalities=["TEXT"],
+            tools=self.tools
+        )
+
         logger.info("GeminiLiveService initialized successfully")
     
     async def _session_background_task(self, session_id):
@@ -110,39 +232,18 @@ class GeminiLiveService:
         message_queue = session_data["message_queue"]
         response_queue = session_data["response_queue"]
         logger.info(f"Starting background task for session {session_id}")
+        live_config = self._live_config
         try:
-            # Create a live config for the session
-            logger.info(f"[DEBUG] System instruction before session: {self.system_instruction}")
-            logger.info(f"[DEBUG] Tools before session: {self.tools}")
-            live_config = types.LiveConnectConfig(
-                system_instruction=Content(
-                    parts=[Part(text=self.system_instruction)]
-                ),
-                response_modalities=["TEXT"],
-                tools=self.tools
-            )
-        except Exception as e:
-            logger.error(f"Error creating live config for session {session_id}: {e}")
-            session_data["connected"] = False
-            return
-        try:
-            logger.info(f"[DEBUG] Attempting to create Gemini client for session {session_id} with model: {self.model_name}")
-            logger.info(f"[DEBUG] Using API key: {GEMINI_API_KEY[:6]}... (truncated)")
-            client = genai.Client(api_key=GEMINI_API_KEY)
-            logger.info(f"[DEBUG] Gemini client created successfully for session {session_id}")
             logger.info(f"[DEBUG] Attempting aio.live.connect for session {session_id} with model: {self.model_name}")
-            async with client.aio.live.connect(model=self.model_name, config=live_config) as session:
+            # Reuse the module-level client: per-session construction pays
+            # TLS/auth setup on every session start
+            async with genai_client.aio.live.connect(model=self.model_name, config=live_config) as session:
                 logger.info(f"Session {session_id} initialized successfully")
                 session_data["connected"] = True
                 session_data["gemini_session"] = session
                 while True:
                     try:
                         message = await message_queue.get()
-                        if message is None:
-                            logger.info(f"Terminating session {session_id} by request")
-                            break
-                        logger.info(f"Processing message for session {session_id}: {str(message)[:50]}...")
-                        self.session_responses[session_id] = {"text": "", "done": False, "audio": None}
                         # Multimodal: combine text and latest frame if present
                         if isinstance(message, tuple):
                             message, frame = message
@@ -151,15 +252,55 @@ class GeminiLiveService:
                         if message is None:
                             logger.info(f"Terminating session {session_id} by request")
                             break
+                        self.session_responses[session_id] = {"text": "", "done": False, "audio": None}
+                        # Attach the newest frame at dequeue time: frames are
+                        # never queued, so a burst of stale frames cannot back
+                        # up behind a slow Gemini turn
+                        if frame is None:
+                            frame = session_data.get("latest_frame")
+                            session_data["latest_frame"] = None
+                            if frame is not None and time.monotonic() - session_data.get("latest_frame_ts", 0.0) > FRAME_STALE_SECS:
+                                logger.info(f"Discarding stale frame for session {session_id}")
+                                frame = None
                         logger.info(f"Processing message for session {session_id}: {str(message)[:50]}... (frame={'yes' if frame else 'no'})")
                         # Multimodal: combine text and latest frame if present
                         if frame:
                             try:
-                                header, encoded = frame.split(",", 1)
-                                mime_type = header.split(":")[1].split(";")[0] if ":" in header and ";" in header else "image/jpeg"
-                                frame_bytes = base64.b64decode(encoded)
-                                parts = [message, Part.from_bytes(data=frame_bytes, mime_type=mime_type)]
-                                logger.info(f"[LiveChat] Sending multimodal input to Gemini: text+image ({mime_type}, {len(frame_bytes)} bytes)")
+                                frame_part = None
+                                if isinstance(frame, Part):
+                                    # Already decoded (and deduped) by
+                                    # handle_video_frame
+                                    frame_part = frame
+                                else:
+                                    # find + slice instead of split chains: no
+                                    # intermediate lists over a multi-MB string
+                                    comma = frame.find(",")
+                                    if comma == -1:
+                                        raise ValueError("invalid data URL: no comma separator")
+                                    header = frame[:comma]
+                                    semi = header.find(";")
+                                    if header.startswith("data:") and semi != -1:
+                                        mime_type = header[5:semi]
+                                    else:
+                                        mime_type = "image/jpeg"
+                                    # Decode (and downscale oversized frames)
+                                    # on the image executor so other sessions'
+                                    # token streams aren't stalled
+                                    frame_bytes, mime_type = await self.loop.run_in_executor(
+                                        self._img_executor, self._decode_frame,
+                                        frame[comma + 1:], mime_type
+                                    )
+                                    # Identical frame to the last one sent:
+                                    # skip the image and save the vision
+                                    # prefill cost of re-processing it
+                                    frame_hash = hashlib.blake2b(frame_bytes, digest_size=8).digest()
+                                    if frame_hash == session_data.get("_last_frame_hash"):
+                                        logger.info(f"[LiveChat] Duplicate frame for session {session_id}; sending text-only")
+                                    else:
+                                        session_data["_last_frame_hash"] = frame_hash
+                                        frame_part = self._part_for_frame(frame_hash, frame_bytes, mime_type)
+                                parts = [message, frame_part] if frame_part else [message]
+                                logger.info(f"[LiveChat] Sending multimodal input to Gemini: text+image")
                                 await session.send(input=parts, end_of_turn=True)
                             except Exception as e:
                                 logger.error(f"[LiveChat] Error processing video frame for multimodal input: {e}")
@@ -172,57 +313,126 @@ class GeminiLiveService:
                         else:
                             logger.info(f"[LiveChat] Sending text-only input to Gemini")
                             await session.send(input=message, end_of_turn=True)
-                        accumulated_text = ""
+                        # Accumulate text as a list of chunks; += on str is
+                        # O(total length) per token for long turns
+                        text_parts = []
+                        # Sentence-level TTS overlap: synthesis of completed
+                        # sentences starts while Gemini is still generating.
+                        # The tasks are kept in sentence order; a single
+                        # emitter awaits them in sequence after the turn, so
+                        # audio reaches the client in order even though the
+                        # 4-worker executor finishes syntheses out of order
+                        tts_buffer = ""
+                        tts_tasks = []
+                        # Coalesce streamed text: one response_chunk per
+                        # STREAM_BATCH_CHARS/STREAM_BATCH_MS window instead
+                        # of one Socket.IO frame per token
+                        chunk_buf = []
+                        chunk_len = 0
+                        last_flush = time.monotonic()
+
+                        def flush_chunks():
+                            nonlocal chunk_len, last_flush
+                            if chunk_buf:
+                                sio = session_data.get("socketio")
+                                sid = session_data.get("client_sid")
+                                if sio and sid:
+                                    sio.emit('response_chunk', {
+                                        'session_id': session_id,
+                                        'text': "".join(chunk_buf),
+                                        'done': False
+                                    }, room=sid)
+                                chunk_buf.clear()
+                                chunk_len = 0
+                            last_flush = time.monotonic()
+
                         # --- Inner response loop: handle Gemini responses for this message ---
                         async for response in session.receive():
                             # 1. Handle text responses (emit response_chunk)
                             if hasattr(response, "text") and response.text:
-                                accumulated_text += response.text
+                                text_parts.append(response.text)
                                 if "socketio" in session_data and "client_sid" in session_data:
                                     socketio = session_data["socketio"]
                                     client_sid = session_data["client_sid"]
-                                    socketio.emit('response_chunk', {
-                                        'session_id': session_id,
-                                        'text': response.text,
-                                        'done': False
-                                    }, room=client_sid)
+                                    chunk_buf.append(response.text)
+                                    chunk_len += len(response.text)
+                                    if (chunk_len >= self.stream_batch_chars
+                                            or time.monotonic() - last_flush >= self.stream_batch_secs):
+                                        flush_chunks()
+                                    # Start synthesis for each completed
+                                    # sentence; emission happens in order via
+                                    # _emit_tts_in_order once the turn ends
+                                    tts_buffer += response.text
+                                    if self.tts_client:
+                                        pieces = _SENT_BOUNDARY_RE.split(tts_buffer)
+                                        for k in range(0, len(pieces) - 1, 2):
+                                            sentence = (pieces[k] + pieces[k + 1]).strip()
+                                            if sentence:
+                                                tts_tasks.append(self.loop.create_task(
+                                                    self._synthesize_cached(sentence)))
+                                        tts_buffer = pieces[-1]
                             # 2. Handle tool calls (function calls)
                             if hasattr(response, "tool_call") and response.tool_call:
-                                function_call_details = response.tool_call.function_calls[0]
-                                tool_call_id = function_call_details.id
-                                function_name = function_call_details.name
-                                function_args = dict(function_call_details.args)
-                                logger.info(f"Function call in session {session_id}: {function_name} with args {function_args}")
-                                function_response = await self._execute_function(function_name, function_args)
-                                if function_name == "search_products" and function_response and "results" in function_response:
-                                    if "socketio" in session_data and "client_sid" in session_data:
-                                        socketio = session_data["socketio"]
-                                        client_sid = session_data["client_sid"]
-                                        enriched_results = [normalize_product(product) for product in function_response["results"]]
-                                        socketio.emit('function_result', {
-                                            'session_id': session_id,
-                                            'function_name': function_name,
-                                            'results': enriched_results
-                                        }, room=client_sid)
-                                    session_data["_function_result_sent"] = True
-                                    # Immediately emit response_complete if not already sent for this message
-                                    if not session_data.get('_response_complete_sent'):
-                                        socketio.emit('response_complete', {
-                                            'session_id': session_id,
-                                            'text': "Here you go!",  # Or use accumulated_text if you prefer
-                                            'done': True
-                                        }, room=client_sid)
-                                        session_data['_response_complete_sent'] = True
-                                func_resp = types.FunctionResponse(
-                                    id=tool_call_id,
-                                    name=function_name,
-                                    response={"content": function_response}
+                                flush_chunks()
+                                function_calls = list(response.tool_call.function_calls)
+                                logger.info(
+                                    f"Function call(s) in session {session_id}: "
+                                    f"{[fc.name for fc in function_calls]}"
+                                )
+
+                                async def _run_call(fc):
+                                    # Pass the args object straight through;
+                                    # _execute_function pulls the fields it
+                                    # needs without materializing the
+                                    # MapComposite into a dict
+                                    async with self._tool_sem:
+                                        return await self._execute_function(fc.name, fc.args)
+
+                                # Overlap the I/O of every tool call in this
+                                # response instead of executing them one at a
+                                # time; _execute_function never raises, so
+                                # gather returns a result per call
+                                function_responses = await asyncio.gather(
+                                    *(_run_call(fc) for fc in function_calls)
                                 )
-                                await session.send(input=func_resp, end_of_turn=False)
+                                for function_call_details, function_response in zip(
+                                        function_calls, function_responses):
+                                    tool_call_id = function_call_details.id
+                                    function_name = function_call_details.name
+                                    if function_name == "search_products" and function_response and "results" in function_response:
+                                        # Normalize once and reuse the same list for
+                                        # the client emit and the response sent back
+                                        # to the model
+                                        enriched_results = normalize_products(function_response["results"])
+                                        function_response = {"results": enriched_results}
+                                        if "socketio" in session_data and "client_sid" in session_data:
+                                            socketio = session_data["socketio"]
+                                            client_sid = session_data["client_sid"]
+                                            socketio.emit('function_result', {
+                                                'session_id': session_id,
+                                                'function_name': function_name,
+                                                'results': enriched_results
+                                            }, room=client_sid)
+                                        session_data["_function_result_sent"] = True
+                                        # Immediately emit response_complete if not already sent for this message
+                                        if not session_data.get('_response_complete_sent'):
+                                            socketio.emit('response_complete', {
+                                                'session_id': session_id,
+                                                'text': "Here you go!",  # Or use accumulated_text if you prefer
+                                                'done': True
+                                            }, room=client_sid)
+                                            session_data['_response_complete_sent'] = True
+                                    func_resp = types.FunctionResponse(
+                                        id=tool_call_id,
+                                        name=function_name,
+                                        response={"content": function_response}
+                                    )
+                                    await session.send(input=func_resp, end_of_turn=False)
                                 break  # --- Only break the inner response loop ---
                             # 3. End of turn: emit response_complete and break
                             if hasattr(response, "end_of_turn") and response.end_of_turn:
-                                final_text = accumulated_text.strip()
+                                flush_chunks()
+                                final_text = "".join(text_parts).strip()
                                 if not final_text and session_data.get("_function_result_sent"):
                                     final_text = "Here you go!"
                                     session_data['_function_result_sent'] = False
@@ -235,13 +445,30 @@ class GeminiLiveService:
                                         'done': True
                                     }, room=client_sid)
                                 break  # --- Only break the inner response loop ---
+                        # Flush any buffered text before completing the turn
+                        flush_chunks()
                         # Always emit response_complete at the end
                         socketio = session_data.get("socketio")
                         client_sid = session_data.get("client_sid")
                         if socketio and client_sid and not session_data.get('_response_complete_sent'):
-                            socketio.emit('response_complete', {"session_id": session_id, "text": accumulated_text, "done": True}, room=client_sid)
+                            socketio.emit('response_complete', {"session_id": session_id, "text": "".join(text_parts), "done": True}, room=client_sid)
                             session_data['_response_complete_sent'] = True
-                            await self.stream_tts_audio(session_id, accumulated_text, socketio, client_sid)
+                        # Synthesize the sentence tail, then hand the turn's
+                        # audio to one emitter task: syntheses overlap on the
+                        # executor, but chunks go out in sentence order and
+                        # audio_stream_end only fires after the last one.
+                        # Emitters chain on the previous turn's task so two
+                        # turns' audio streams never interleave on the socket
+                        if socketio and client_sid and self.tts_client:
+                            tail = tts_buffer.strip()
+                            if tail:
+                                tts_tasks.append(self.loop.create_task(
+                                    self._synthesize_cached(tail)))
+                            session_data["_tts_emitter"] = self.loop.create_task(
+                                self._emit_tts_in_order(
+                                    session_id, tts_tasks, socketio, client_sid,
+                                    prev_emitter=session_data.get("_tts_emitter")
+                                ))
                         elif not socketio or not client_sid:
                             logger.error(f"[LiveChat] Cannot emit response_complete: socketio or client_sid missing for session {session_id}")
                         # Reset the safeguard for the next message
@@ -249,11 +476,13 @@ class GeminiLiveService:
                         # Mark the response as done
                         self.session_responses[session_id]["done"] = True
                         await response_queue.put(True)
-                        logger.info(f"[LiveChat] Gemini response: {response}")
-                        if hasattr(response, 'tool_call') and response.tool_call:
-                            logger.info(f"[LiveChat] Tool call detected: {response.tool_call}")
-                        else:
-                            logger.info(f"[LiveChat] No tool_call in response. Response keys: {dir(response)}")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(
+                                "[LiveChat] Last response: text=%s tool_call=%s end_of_turn=%s",
+                                getattr(response, "text", None) is not None,
+                                bool(getattr(response, "tool_call", None)),
+                                bool(getattr(response, "end_of_turn", None)),
+                            )
                     except asyncio.TimeoutError:
                         pass
             session_data["connected"] = False
@@ -283,8 +512,11 @@ class GeminiLiveService:
                 "tools": self.tools
             }
         
-        # Create message queues for communication with the background task
-        message_queue = asyncio.Queue()
+        # Create message queues for communication with the background task.
+        # The message queue is bounded: frames are ~100 KB base64 strings and
+        # an unbounded queue grows without limit whenever Gemini falls behind
+        # the frontend. Frames themselves never queue — see latest_frame below.
+        message_queue = _SPSCQueue(maxsize=4)
         response_queue = asyncio.Queue()
         
         # Store the session data
@@ -295,7 +527,8 @@ class GeminiLiveService:
             "connected": False,
             "task": None,
             "history": [],  # Initialize conversation history
-            "gemini_session": None  # Will be set in the background task
+            "gemini_session": None,  # Will be set in the background task
+            "latest_frame": None  # Single-slot newest video frame (overwrite)
         }
         
         # Initialize the response for this session
@@ -310,25 +543,54 @@ class GeminiLiveService:
         
         return session_id
         
+    async def _get_http(self):
+        """Return the shared aiohttp session, creating it lazily under a lock."""
+        if self._http is None or self._http.closed:
+            async with self._http_lock:
+                if self._http is None or self._http.closed:
+                    self._http = aiohttp.ClientSession(
+                        connector=aiohttp.TCPConnector(
+                            limit=64,
+                            ttl_dns_cache=300,
+                            keepalive_timeout=60
+                        )
+                    )
+        return self._http
+
+    async def aclose(self):
+        """Close the shared aiohttp session (process shutdown)."""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+            self._http = None
+
     async def _execute_function(self, function_name, function_args):
-        logger.info(f"[LiveChat] _execute_function called: {function_name} with args {function_args}")
         """Execute a function called by the Gemini API"""
-        logger.info(f"Executing function {function_name} with args {function_args}")
+        logger.info(f"[LiveChat] Executing function {function_name}")
         
         if function_name == "search_products":
-            # Extract the query from the function arguments
-            query = function_args.get("query")
+            # Extract the single field we use directly from the args object
+            # (MapComposite supports .get; fall back to attribute access)
+            if hasattr(function_args, "get"):
+                query = function_args.get("query")
+            else:
+                query = getattr(function_args, "query", None)
+            query = (query or "")[:MAX_SEARCH_QUERY_LEN]
             if not query:
                 return {"error": "No query provided"}
             
-            # Execute the search function
+            # Execute the search function. The pipeline lives in this process
+            # (search_service.search_products), so call it directly on an
+            # executor thread instead of round-tripping through the Flask
+            # endpoint. SEARCH_OVER_HTTP=1 restores the old loopback path.
             try:
-                # Make a request to the search endpoint
-                async with aiohttp.ClientSession() as session:
-                    search_url = f"http://localhost:5000/api/search?query={query}"
-                    logger.info(f"Making search request to: {search_url}")
-                    
-                    async with session.get(search_url) as response:
+                if os.getenv("SEARCH_OVER_HTTP") == "1":
+                    session = await self._get_http()
+                    logger.info(f"Making search request to: {SEARCH_URL} (query: {query})")
+
+                    # params= urlencodes the model-supplied query instead of
+                    # interpolating it raw into the URL
+                    async with session.get(SEARCH_URL, params={"query": query},
+                                           timeout=aiohttp.ClientTimeout(total=5)) as response:
                         if response.status == 200:
                             data = await response.json()
                             logger.info(f"Search returned {len(data.get('results', []))} results")
@@ -337,6 +599,13 @@ class GeminiLiveService:
                             error_text = await response.text()
                             logger.error(f"Search failed with status {response.status}: {error_text}")
                             return {"error": f"Search failed with status {response.status}: {error_text}"}
+                else:
+                    loop = asyncio.get_running_loop()
+                    data = await loop.run_in_executor(
+                        None, functools.partial(search_products, query=query)
+                    )
+                    logger.info(f"Search returned {len(data.get('results', []))} results")
+                    return data
             except Exception as e:
                 logger.error(f"Error executing search_products function: {e}")
                 return {"error": f"Error executing search: {str(e)}"}
@@ -346,22 +615,20 @@ class GeminiLiveService:
     
     def get_current_response(self, session_id):
         """Get the current response for a session"""
-        if session_id in self.session_responses:
-            return self.session_responses[session_id]
-        return None
-        
+        return self.session_responses.get(session_id)
+
     def clear_response(self, session_id):
         """Clear the response for a session after it has been retrieved"""
-        if session_id in self.session_responses:
-            # Don't completely remove the response, just mark it as retrieved
-            # This way, we can still accumulate more text if needed
-            if self.session_responses[session_id].get("done", False):
-                # Only clear if the response is complete
-                self.session_responses[session_id] = {"text": "", "done": False, "audio": None, "retrieved": True}
-            
-            logger.info(f"Cleared response for session {session_id}")
-        else:
+        response = self.session_responses.get(session_id)
+        if response is None:
             logger.warning(f"No response to clear for session {session_id}")
+            return
+        # Don't completely remove the response, just mark it as retrieved
+        # This way, we can still accumulate more text if needed. Only clear
+        # if the response is complete.
+        if response.get("done", False):
+            self.session_responses[session_id] = {"text": "", "done": False, "audio": None, "retrieved": True}
+        logger.info(f"Cleared response for session {session_id}")
     
     def get_current_audio_response(self, session_id):
         """Get the current audio response for a session"""
@@ -418,10 +685,14 @@ class GeminiLiveService:
             message, frame = message_tuple
         else:
             message, frame = message_tuple, None
-        # Enqueue as a tuple for the background task
+        # Frames never queue: overwrite the single latest_frame slot so only
+        # the newest frame accompanies the next turn, then enqueue the text
+        if frame:
+            session_data["latest_frame"] = frame
+            session_data["latest_frame_ts"] = time.monotonic()
         message_queue = self.active_sessions[session_id]["message_queue"]
-        await message_queue.put((message, frame))
-        logger.info(f"Enqueued (message, frame) for session {session_id}")
+        await message_queue.put(message)
+        logger.info(f"Enqueued message for session {session_id}")
         
         # Return a success response
         return {"status": "processing"}
@@ -509,21 +780,41 @@ class GeminiLiveService:
             # Send the message to the model
             await session.send_client_content(turns=message_content, turn_complete=True)
             
-            # Process the response
-            accumulated_text = ""
+            # Process the response; chunks collected in a list and joined
+            # once at the end instead of quadratic str concatenation
+            text_parts = []
+            tts_pending = ""
             function_call_received = False
-            
+
             # Receive and process the response
             async for response in session.receive():
                 try:
                     # Handle text responses
                     if response.text is not None:
-                        accumulated_text += response.text
+                        text_parts.append(response.text)
+                        tts_pending += response.text
                         yield {
                             "type": "text",
                             "text": response.text,
                             "done": False
                         }
+                        # Synthesize each completed sentence as soon as its
+                        # terminator arrives, so audio playback starts while
+                        # the model is still generating instead of after one
+                        # big synthesis of the whole reply
+                        if self.tts_client:
+                            pieces = _SENT_BOUNDARY_RE.split(tts_pending)
+                            if len(pieces) > 1:
+                                tts_pending = pieces[-1]
+                                for k in range(0, len(pieces) - 1, 2):
+                                    sentence = (pieces[k] + pieces[k + 1]).strip()
+                                    if sentence:
+                                        audio_bytes = await self._synthesize_cached(sentence)
+                                        yield {
+                                            "type": "audio",
+                                            "audio": b64encode_str(audio_bytes),
+                                            "final": False
+                                        }
                     
                     # Handle tool calls (function calls)
                     if response.tool_call and not function_call_received:
@@ -534,39 +825,35 @@ class GeminiLiveService:
                             # Handle search_products function
                             if fc.name == "search_products":
                                 try:
-                                    # Extract query from args
-                                    if hasattr(fc.args, 'get'):
-                                        # Handle MapComposite object directly
-                                        query = fc.args.get("query", "")
-                                    else:
-                                        # Handle string JSON
-                                        try:
-                                            args = json.loads(fc.args)
-                                            query = args.get("query", "")
-                                        except Exception as json_err:
-                                            logger.error(f"Error parsing function args as JSON: {json_err}")
-                                            query = str(fc.args)
+                                    # MapComposite supports .get directly;
+                                    # anything else is a JSON string. Parse
+                                    # failures propagate to the handler below
+                                    # instead of using the args repr as query.
+                                    args = fc.args if hasattr(fc.args, 'get') else _json_loads(fc.args)
+                                    query = args.get("query", "")
                                     
                                     logger.info(f"Searching for products with query: {query}")
-                                    
-                                    # Make a request to our search API
-                                    import requests
-                                    response = requests.get(f"http://localhost:5000/api/search?query={query}")
-                                    data = response.json()
-                                    
-                                    if 'results' in data:
-                                        # Format the results for the model
-                                        search_results = []
-                                        for product in data['results'][:5]:  # Limit to 5 products for cleaner responses
-                                            search_results.append({
-                                                "id": product.get('id', ''),
-                                                "name": product.get('name', ''),
-                                                "price": product.get('price', ''),
-                                                "image_url": product.get('image_url', ''),
-                                                "aisle": product.get('aisle', '')
-                                            })
+
+                                    # Run the search pipeline in-process on an
+                                    # executor thread — it is blocking code, and
+                                    # running it inline would stall every session
+                                    # on the event loop. SEARCH_OVER_HTTP=1
+                                    # restores the old loopback request.
+                                    query = query[:MAX_SEARCH_QUERY_LEN]
+                                    if os.getenv("SEARCH_OVER_HTTP") == "1":
+                                        http = await self._get_http()
+                                        async with http.get(
+                                            SEARCH_URL, params={"query": query},
+                                            timeout=aiohttp.ClientTimeout(total=5)
+                                        ) as search_resp:
+                                            data = await search_resp.json()
                                     else:
-                                        search_results = []
+                                        data = await asyncio.get_running_loop().run_in_executor(
+                                            None, functools.partial(search_products, query=query)
+                                        )
+                                    
+                                    # Limit to 5 products for cleaner responses
+                                    search_results = summarize_products(data.get('results', []))
                                     
                                     # Return the search results to the client
                                     yield {
@@ -602,25 +889,21 @@ class GeminiLiveService:
                     yield {"type": "error", "error": f"Error processing response: {str(e)}"}
             
             # Add the complete response to history
+            accumulated_text = "".join(text_parts)
             session_data["history"].append({"role": "assistant", "parts": [{"text": accumulated_text}]})
             
-            # Generate audio for the complete response if TTS is available
+            # Synthesize the unterminated tail and mark the audio stream done
             if self.tts_client and accumulated_text:
                 try:
-                    synthesis_input = texttospeech.SynthesisInput(text=accumulated_text)
-                    response = self.tts_client.synthesize_speech(
-                        input=synthesis_input,
-                        voice=self.voice,
-                        audio_config=self.audio_config
-                    )
-                    
-                    # Encode the audio content as base64
-                    audio_content = base64.b64encode(response.audio_content).decode('utf-8')
-                    
-                    # Yield the audio response
+                    tail = tts_pending.strip()
+                    audio_content = ""
+                    if tail:
+                        audio_bytes = await self._synthesize_cached(tail)
+                        audio_content = b64encode_str(audio_bytes)
                     yield {
                         "type": "audio",
-                        "audio": audio_content
+                        "audio": audio_content,
+                        "final": True
                     }
                 except Exception as e:
                     logger.error(f"Error generating audio: {e}")
@@ -641,44 +924,161 @@ class GeminiLiveService:
             logger.error(f"Error in send_user_input_to_session: {e}")
             yield {"type": "error", "error": f"Error processing request: {str(e)}"}
 
+    def _part_for_frame(self, frame_hash, frame_bytes, mime_type):
+        """Return a Part for this frame, reusing a cached one when possible."""
+        key = (frame_hash, mime_type)
+        part = self._part_cache.get(key)
+        if part is None:
+            part = Part.from_bytes(data=frame_bytes, mime_type=mime_type)
+            self._part_cache[key] = part
+            if len(self._part_cache) > self._part_cache_max:
+                self._part_cache.popitem(last=False)
+        else:
+            self._part_cache.move_to_end(key)
+        return part
+
+    @staticmethod
+    def _decode_frame(encoded, mime_type):
+        """Decode a frame, downscaling large images (runs on _img_executor).
+
+        Accepts either a base64 payload (data-URL clients) or raw JPEG bytes
+        (binary Socket.IO uploads), which skip the decode entirely.
+        """
+        if isinstance(encoded, (bytes, bytearray)):
+            frame_bytes = bytes(encoded)
+        else:
+            frame_bytes = b64decode(encoded, validate=False)
+        if len(frame_bytes) > FRAME_DOWNSCALE_BYTES:
+            img = PILImage.open(io.BytesIO(frame_bytes))
+            img.thumbnail((FRAME_MAX_DIM, FRAME_MAX_DIM))
+            buf = io.BytesIO()
+            img.convert("RGB").save(buf, format="JPEG", quality=80)
+            frame_bytes = buf.getvalue()
+            mime_type = "image/jpeg"
+        return frame_bytes, mime_type
+
     def handle_video_frame(self, session_id, frame_data_url):
         """Handle a video frame sent from the client in LiveChat mode."""
         logger.info(f"[LiveChat] handle_video_frame called for session {session_id}")
         if session_id not in self.active_sessions:
             logger.error(f"[LiveChat] Session not found: {session_id}")
             return
+        # Raw binary frames (Socket.IO binary attachments) carry no base64
+        # hop at all: no 33% transport inflation, no decode on our side
+        if isinstance(frame_data_url, (bytes, bytearray)):
+            self._img_executor.submit(self._stage_frame, session_id, frame_data_url, "image/jpeg")
+            return
+        # Parse the data URL with find + slice: no intermediate split
+        # lists over a multi-hundred-KB string, and the header slice is
+        # tiny compared to the payload
+        comma = frame_data_url.find(",")
+        if comma == -1:
+            encoded = frame_data_url
+            mime_type = "image/jpeg"
+        else:
+            header = frame_data_url[:comma]
+            colon = header.find(":")
+            semi = header.find(";")
+            mime_type = header[colon + 1:semi] if -1 < colon < semi else "image/jpeg"
+            encoded = frame_data_url[comma + 1:]
+        # Under eventlet this handler runs in a greenlet, so an inline PIL
+        # decode would stall every other Socket.IO connection; do the image
+        # work on the dedicated executor instead
+        self._img_executor.submit(self._stage_frame, session_id, encoded, mime_type)
+
+    def _stage_frame(self, session_id, encoded, mime_type):
+        """Decode, dedupe, and stage a frame (runs on _img_executor)."""
         try:
-            # Parse the data URL
-            header, encoded = frame_data_url.split(",", 1)
-            mime_type = header.split(":")[1].split(";")[0] if ":" in header and ";" in header else "image/jpeg"
-            frame_bytes = base64.b64decode(encoded)
-            # Create a Gemini Part for the image
-            part = Part.from_bytes(data=frame_bytes, mime_type=mime_type)
-            # Enqueue the image part to the session's message queue
-            message_queue = self.active_sessions[session_id]["message_queue"]
-            self.loop.call_soon_threadsafe(message_queue.put_nowait, part)
-            logger.info(f"[LiveChat] Video frame enqueued for session {session_id}")
+            frame_bytes, mime_type = self._decode_frame(encoded, mime_type)
+            # Drop frames identical to the last one staged: re-sending them
+            # only repeats the vision prefill for no new information
+            session_data = self.active_sessions.get(session_id)
+            if session_data is None:
+                return
+            frame_hash = hashlib.blake2b(frame_bytes, digest_size=8).digest()
+            if frame_hash == session_data.get("_last_frame_hash"):
+                logger.debug(f"[LiveChat] Duplicate frame dropped for session {session_id}")
+                return
+            session_data["_last_frame_hash"] = frame_hash
+            # Create a Gemini Part for the image (cached by frame hash)
+            part = self._part_for_frame(frame_hash, frame_bytes, mime_type)
+            # Overwrite the single latest_frame slot instead of queueing: the
+            # background task attaches the newest frame to the next message,
+            # so stale frames never pile up in RAM or trigger wasted inference
+            session_data["latest_frame"] = part
+            session_data["latest_frame_ts"] = time.monotonic()
+            logger.info(f"[LiveChat] Video frame staged for session {session_id}")
         except Exception as e:
             logger.error(f"[LiveChat] Error handling video frame for session {session_id}: {e}")
 
-    async def stream_tts_audio(self, session_id, text, socketio, client_sid):
-        """Stream TTS audio chunks to the client for playback (modular, ADA-style)."""
-        if not self.tts_client or not text:
-            return
-        try:
-            synthesis_input = texttospeech.SynthesisInput(text=text)
-            tts_response = self.tts_client.synthesize_speech(
+    async def _synthesize_cached(self, text):
+        """Synthesize speech for text, serving repeats from the LRU cache.
+
+        Long texts bypass the cache: only short recurring phrasings
+        (greetings, confirmations, fallbacks) repeat often enough to be worth
+        the memory, and one long reply would evict many of them.
+        """
+        cacheable = len(text) < self._tts_cache_text_max
+        if cacheable:
+            key = (
+                hashlib.blake2b(text.encode(), digest_size=16).digest(),
+                self.voice.name,
+                self.audio_config.audio_encoding,
+            )
+            async with self._tts_cache_lock:
+                audio_bytes = self._tts_cache.get(key)
+                if audio_bytes is not None:
+                    self._tts_cache.move_to_end(key)
+                    return audio_bytes
+        synthesis_input = texttospeech.SynthesisInput(text=text)
+        tts_response = await self.loop.run_in_executor(
+            self._tts_executor,
+            lambda: self.tts_client.synthesize_speech(
                 input=synthesis_input,
                 voice=self.voice,
                 audio_config=self.audio_config
             )
-            audio_bytes = tts_response.audio_content
-            # Simulate chunking (e.g., 4KB per chunk)
-            chunk_size = 4096
-            for i in range(0, len(audio_bytes), chunk_size):
-                chunk = audio_bytes[i:i+chunk_size]
-                audio_b64 = base64.b64encode(chunk).decode('utf-8')
-                socketio.emit('receive_audio_chunk', {'audio': audio_b64}, room=client_sid)
-            socketio.emit('audio_stream_end', {}, room=client_sid)
+        )
+        audio_bytes = tts_response.audio_content
+        if cacheable:
+            async with self._tts_cache_lock:
+                self._tts_cache[key] = audio_bytes
+                if len(self._tts_cache) > self._tts_cache_max:
+                    self._tts_cache.popitem(last=False)
+        return audio_bytes
+
+    async def _emit_tts_in_order(self, session_id, synth_tasks, socketio, client_sid,
+                                 prev_emitter=None):
+        """Emit one turn's synthesized sentences in order, then close the stream.
+
+        Syntheses overlap on the TTS executor, but this single emitter awaits
+        the tasks in sentence order, so receive_audio_chunk packets reach the
+        client in sequence and audio_stream_end fires only after the final
+        sentence — never while earlier ones are still synthesizing. Each turn
+        chains on the previous turn's emitter, so the client (which buffers
+        chunks until audio_stream_end) always sees disjoint streams.
+        """
+        if prev_emitter is not None and not prev_emitter.done():
+            # The prior turn handles its own errors; just wait it out
+            await asyncio.wait({prev_emitter})
+        try:
+            for seq, task in enumerate(synth_tasks):
+                try:
+                    audio_bytes = await task
+                except Exception as e:
+                    logger.error(f"Error synthesizing TTS segment {seq} for session {session_id}: {e}")
+                    continue
+                # Emit in coalesced packets, yielding to the loop between
+                # emits so concurrent sessions' traffic can interleave.
+                # memoryview slices reference the buffer instead of copying
+                # a fresh bytes object per chunk
+                mv = memoryview(audio_bytes)
+                for i in range(0, len(mv), TTS_EMIT_CHUNK):
+                    audio_b64 = b64encode_str(mv[i:i + TTS_EMIT_CHUNK])
+                    socketio.emit('receive_audio_chunk', {'audio': audio_b64, 'seq': seq},
+                                  room=client_sid)
+                    await asyncio.sleep(0)
         except Exception as e:
             logger.error(f"Error streaming TTS audio: {e}")
+        finally:
+            socketio.emit('audio_stream_end', {}, room=client_sid)
@@ -1,12 +1,40 @@
 import os
 import json
 import logging
-import base64
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
+from utils import b64decode, summarize_products
+from search_service import search_products
+
+# orjson parses the small args dicts 2-3x faster than stdlib json
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 import google.generativeai as genai
 from dotenv import load_dotenv
 from gemini_tool_definitions import SEARCH_PRODUCTS_TOOL
 
+# When one model response carries several tool calls, their search I/O is
+# overlapped on this pool; the worker count bounds the fan-out
+_tool_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tool")
+
+# Pooled HTTP session for the SEARCH_OVER_HTTP fallback: reuses connections
+# instead of paying a TCP handshake per tool call
+_http_session = None
+
+def _get_http_session():
+    global _http_session
+    if _http_session is None:
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=32)
+        session.mount('http://', adapter)
+        _http_session = session
+    return _http_session
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,26 +73,62 @@ class GeminiMultimodalService:
         
         logger.info(f"Generation config: {self.generation_config}")
         
-        # Initialize the model
+        # System instructions from environment variables
+        default_instructions = """You are an intelligent assistant that helps users find products,
+        answer questions, and provide helpful information. You can search for products when asked.
+        Always provide concise and helpful responses."""
+
+        self.system_instructions = os.getenv("GEMINI_MULTIMODAL_INSTRUCTIONS", default_instructions)
+
+        # Initialize the model (shared across instances per process)
         try:
-            self.model = genai.GenerativeModel(
+            self.model, self._model_has_system_instruction = self._get_model(
                 self.model_name,
-                generation_config=self.generation_config,
-                tools=[self.tools]
+                tuple(sorted(self.generation_config.items())),
+                self.system_instructions
             )
-            
-            # System instructions from environment variables
-            default_instructions = """You are an intelligent assistant that helps users find products, 
-            answer questions, and provide helpful information. You can search for products when asked.
-            Always provide concise and helpful responses."""
-            
-            self.system_instructions = os.getenv("GEMINI_MULTIMODAL_INSTRUCTIONS", default_instructions)
-            
+
+            # Primer turns injected into empty histories only when the SDK
+            # can't take the instructions natively — as real turns they are
+            # tokenized and billed on every new conversation
+            self._primer_history = [
+                {"role": "user", "parts": [{"text": self.system_instructions}]},
+                {"role": "model", "parts": [{"text": "I'll help you find products and answer your questions."}]}
+            ]
+
             logger.info("GeminiMultimodalService initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing Gemini model: {e}")
             raise
     
+    @classmethod
+    @lru_cache(maxsize=1)
+    def _get_model(cls, model_name, gen_config_items, system_instruction):
+        """Build the GenerativeModel once per process and share it.
+
+        Model construction compiles the tool schema and generation config;
+        caching on (model name, config, instructions) amortizes that across
+        instances, e.g. when workers construct the service per connection.
+        Returns (model, True) when the SDK accepted system_instruction, else
+        (model, False) and callers must prime the history themselves.
+        """
+        try:
+            model = genai.GenerativeModel(
+                model_name,
+                generation_config=dict(gen_config_items),
+                tools=[[SEARCH_PRODUCTS_TOOL]],
+                system_instruction=system_instruction
+            )
+            return model, True
+        except TypeError:
+            # google-generativeai < 0.5 has no system_instruction kwarg
+            model = genai.GenerativeModel(
+                model_name,
+                generation_config=dict(gen_config_items),
+                tools=[[SEARCH_PRODUCTS_TOOL]]
+            )
+            return model, False
+
     def _format_history(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Format the conversation history for the Gemini API"""
         formatted_history = []
@@ -86,49 +150,35 @@ class GeminiMultimodalService:
         
         if function_call.name == "search_products":
             try:
-                # Handle different types of args (str or MapComposite)
-                if hasattr(function_call.args, 'get'):
-                    # Handle MapComposite object directly
-                    query = function_call.args.get("query", "")
-                    logger.info(f"Extracted query from MapComposite: {query}")
-                else:
-                    # Handle string JSON
-                    try:
-                        args = json.loads(function_call.args)
-                        query = args.get("query", "")
-                        logger.info(f"Extracted query from JSON string: {query}")
-                    except Exception as json_err:
-                        logger.error(f"Error parsing function args as JSON: {json_err}")
-                        query = str(function_call.args)
-                        logger.info(f"Using function args as string: {query}")
+                # MapComposite supports .get directly; anything else is a
+                # JSON string. A parse failure falls through to the outer
+                # handler instead of silently using the args repr as a query.
+                args = function_call.args if hasattr(function_call.args, 'get') else _json_loads(function_call.args)
+                query = args.get("query", "")
                 
-                # Make a request to our search API
-                import requests
+                # Run the search pipeline in-process; this service is fully
+                # synchronous (Flask worker threads), so a direct call is
+                # fine and skips the HTTP loopback round-trip entirely.
+                # SEARCH_OVER_HTTP=1 restores the old request path.
                 logger.info(f"Searching for products with query: {query}")
-                response = requests.get(f"http://localhost:5000/api/search?query={query}")
-                data = response.json()
-                
-                if 'results' in data:
-                    # Format the results for the model
-                    search_results = []
-                    for product in data['results'][:5]:  # Limit to 5 products for cleaner responses
-                        search_results.append({
-                            "id": product.get('id', ''),
-                            "name": product.get('name', ''),
-                            "price": product.get('price', ''),
-                            "image_url": product.get('image_url', ''),
-                            "aisle": product.get('aisle', '')
-                        })
-                    
-                    return {
-                        "function_name": "search_products",
-                        "results": search_results
-                    }
+                if os.getenv("SEARCH_OVER_HTTP") == "1":
+                    # timeout keeps a stalled search endpoint from hanging
+                    # the tool call indefinitely
+                    response = _get_http_session().get(
+                        "http://localhost:5000/api/search",
+                        params={"query": query},
+                        timeout=5
+                    )
+                    data = response.json()
                 else:
-                    return {
-                        "function_name": "search_products",
-                        "results": []
-                    }
+                    data = search_products(query=query)
+                
+                # Limit to 5 products for cleaner responses
+                search_results = summarize_products(data.get('results', []))
+                return {
+                    "function_name": "search_products",
+                    "results": search_results
+                }
             except Exception as e:
                 logger.error(f"Error processing search_products function call: {e}")
                 return {
@@ -140,7 +190,35 @@ class GeminiMultimodalService:
             "function_name": function_call.name,
             "error": "Unsupported function"
         }
-    
+
+    def _run_function_calls(self, chat, function_calls, result, text_parts):
+        """Execute the function calls from one response, overlapping their I/O.
+
+        This service is synchronous (Flask worker threads), so fan-out uses
+        the shared tool executor rather than asyncio. The follow-up turns
+        stay sequential: the chat object is not thread-safe.
+        """
+        if not function_calls:
+            return
+        if len(function_calls) > 1:
+            function_results = list(_tool_executor.map(self._process_function_call, function_calls))
+        else:
+            function_results = [self._process_function_call(function_calls[0])]
+        for function_result in function_results:
+            result["function_results"].append(function_result)
+
+            # Continue the conversation with the function results
+            function_response = chat.send_message({
+                "function_response": {
+                    "name": function_result["function_name"],
+                    "response": {"products": function_result.get("results", [])}
+                }
+            })
+
+            # Add the function response text
+            if hasattr(function_response, 'text'):
+                text_parts.append(function_response.text)
+
     def generate_content(self, message: str, history: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate a response to a text message using the Gemini API"""
         try:
@@ -149,48 +227,36 @@ class GeminiMultimodalService:
             # Format history if provided
             formatted_history = self._format_history(history) if history else []
             
-            # Create a chat session with system instructions as first message if no history
-            if not formatted_history:
-                # Add system instruction as a first hidden message
-                system_message = {"role": "user", "parts": [{"text": self.system_instructions}]}
-                system_response = {"role": "model", "parts": [{"text": "I'll help you find products and answer your questions."}]}
-                formatted_history = [system_message, system_response]
+            # Prime an empty history only when the model couldn't take the
+            # system instructions natively
+            if not formatted_history and not self._model_has_system_instruction:
+                formatted_history = list(self._primer_history)
             
-            # Create a chat session without system_instruction parameter
             chat = self.model.start_chat(history=formatted_history)
             
             # Send the message
             response = chat.send_message(message)
             
-            # Process the response
+            # Process the response; collect text pieces and join once
+            # instead of growing an immutable str per part
             result = {
-                "text": "",
                 "function_results": []
             }
-            
-            # Handle function calls
+            text_parts = []
+
+            # Split the parts once: text appends directly, function calls
+            # are collected and fanned out together
+            function_calls = []
             if hasattr(response, 'parts'):
                 for part in response.parts:
                     if hasattr(part, 'function_call') and part.function_call:
-                        function_result = self._process_function_call(part.function_call)
-                        result["function_results"].append(function_result)
-                        
-                        # Continue the conversation with the function results
-                        function_response = chat.send_message({
-                            "function_response": {
-                                "name": function_result["function_name"],
-                                "response": {"products": function_result.get("results", [])}
-                            }
-                        })
-                        
-                        # Add the function response text
-                        if hasattr(function_response, 'text'):
-                            result["text"] += function_response.text
-                    
-                    # Add text content
+                        function_calls.append(part.function_call)
                     elif hasattr(part, 'text') and part.text:
-                        result["text"] += part.text
-            
+                        text_parts.append(part.text)
+
+            self._run_function_calls(chat, function_calls, result, text_parts)
+
+            result["text"] = "".join(text_parts)
             logger.info(f"Generated response: {result['text'][:50]}...")
             return result
         
@@ -198,6 +264,58 @@ class GeminiMultimodalService:
             logger.error(f"Error generating content: {e}")
             return {"error": str(e)}
     
+    def generate_content_stream(self, message: str, history: List[Dict[str, Any]] = None):
+        """Generate a response as a stream of chunk dicts.
+
+        Yields {"type": "text", "text": ...} as tokens arrive (instead of
+        waiting for the whole response like generate_content), interleaved
+        with {"type": "function_result", ...} for tool calls, and ends with
+        {"type": "done"}.
+        """
+        try:
+            logger.info(f"Streaming content for message: {message[:50]}...")
+
+            formatted_history = self._format_history(history) if history else []
+            if not formatted_history and not self._model_has_system_instruction:
+                formatted_history = list(self._primer_history)
+
+            chat = self.model.start_chat(history=formatted_history)
+            response = chat.send_message(message, stream=True)
+
+            # Collect function calls while draining the stream: send_message
+            # builds its request from chat.history, which raises
+            # IncompleteIterationError until the streamed response is fully
+            # iterated, so the follow-up must wait for the loop to finish
+            function_calls = []
+            for chunk in response:
+                for part in getattr(chunk, 'parts', None) or []:
+                    if getattr(part, 'function_call', None):
+                        function_calls.append(part.function_call)
+                    elif getattr(part, 'text', None):
+                        yield {"type": "text", "text": part.text}
+
+            for function_call in function_calls:
+                function_result = self._process_function_call(function_call)
+                yield {"type": "function_result", **function_result}
+
+                # Stream the model's follow-up on the tool results too;
+                # the inner loop drains it fully before the next send
+                follow_up = chat.send_message({
+                    "function_response": {
+                        "name": function_result["function_name"],
+                        "response": {"products": function_result.get("results", [])}
+                    }
+                }, stream=True)
+                for follow_chunk in follow_up:
+                    for follow_part in getattr(follow_chunk, 'parts', None) or []:
+                        if getattr(follow_part, 'text', None):
+                            yield {"type": "text", "text": follow_part.text}
+
+            yield {"type": "done"}
+        except Exception as e:
+            logger.error(f"Error streaming content: {e}")
+            yield {"type": "error", "error": str(e)}
+
     def generate_content_with_image(self, message: str, image_data: str, history: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate a response to a message with an image using the Gemini API"""
         try:
@@ -212,16 +330,13 @@ class GeminiMultimodalService:
                 image_data = image_data.split(",")[1]
             
             # Decode the base64 image
-            image_bytes = base64.b64decode(image_data)
+            image_bytes = b64decode(image_data)
             
-            # Create a chat session with system instructions as first message if no history
-            if not formatted_history:
-                # Add system instruction as a first hidden message
-                system_message = {"role": "user", "parts": [{"text": self.system_instructions}]}
-                system_response = {"role": "model", "parts": [{"text": "I'll help you find products and answer your questions."}]}
-                formatted_history = [system_message, system_response]
+            # Prime an empty history only when the model couldn't take the
+            # system instructions natively
+            if not formatted_history and not self._model_has_system_instruction:
+                formatted_history = list(self._primer_history)
             
-            # Create a chat session without system_instruction parameter
             chat = self.model.start_chat(history=formatted_history)
             
             # Create the message with image
@@ -233,35 +348,26 @@ class GeminiMultimodalService:
             # Send the message with image
             response = chat.send_message(message_with_image)
             
-            # Process the response
+            # Process the response; collect text pieces and join once
+            # instead of growing an immutable str per part
             result = {
-                "text": "",
                 "function_results": []
             }
-            
-            # Handle function calls
+            text_parts = []
+
+            # Split the parts once: text appends directly, function calls
+            # are collected and fanned out together
+            function_calls = []
             if hasattr(response, 'parts'):
                 for part in response.parts:
                     if hasattr(part, 'function_call') and part.function_call:
-                        function_result = self._process_function_call(part.function_call)
-                        result["function_results"].append(function_result)
-                        
-                        # Continue the conversation with the function results
-                        function_response = chat.send_message({
-                            "function_response": {
-                                "name": function_result["function_name"],
-                                "response": {"products": function_result.get("results", [])}
-                            }
-                        })
-                        
-                        # Add the function response text
-                        if hasattr(function_response, 'text'):
-                            result["text"] += function_response.text
-                    
-                    # Add text content
+                        function_calls.append(part.function_call)
                     elif hasattr(part, 'text') and part.text:
-                        result["text"] += part.text
-            
+                        text_parts.append(part.text)
+
+            self._run_function_calls(chat, function_calls, result, text_parts)
+
+            result["text"] = "".join(text_parts)
             logger.info(f"Generated response for image: {result['text'][:50]}...")
             return result
         
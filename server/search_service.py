@@ -0,0 +1,161 @@
+"""In-process product search shared by the HTTP endpoint and the live services.
+
+The Gemini live services used to reach the search pipeline through
+http://localhost:5000/api/search — a full HTTP round-trip (JSON encode,
+socket, Flask routing, JSON decode) to code running in the same process.
+This module exposes the pipeline directly; the Flask /api/search route is a
+thin wrapper around search_products().
+"""
+
+import os
+import time
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bigquery_service import BigQueryService
+from vertex_ai_service import VertexAIService
+from utils import normalize_products
+
+logger = logging.getLogger(__name__)
+
+# Fallback pool for the parallel BigQuery calls when the caller does not
+# provide one (app.py passes its shared executor)
+_default_executor = None
+
+
+def _get_default_executor():
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search")
+    return _default_executor
+
+
+# Cache Google Cloud service clients by their configuration so gRPC channels,
+# auth state, and TLS sessions are reused across requests instead of being
+# rebuilt on every search. The lru_cache key means a config change during
+# development still picks up fresh clients.
+@functools.lru_cache(maxsize=4)
+def _get_vertex_service(project_id, location, feature_store_id, feature_view_id):
+    return VertexAIService(
+        project_id=project_id,
+        location=location,
+        feature_store_id=feature_store_id,
+        feature_view_id=feature_view_id
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _get_bigquery_service(project_id, dataset):
+    return BigQueryService(
+        project_id=project_id,
+        dataset=dataset
+    )
+
+
+def search_products(query=None, image_data=None, neighbor_count=10, executor=None):
+    """Run the product search pipeline and return {'results', 'elapsed_time'}.
+
+    Raises ValueError when neither query nor image_data is provided and
+    RuntimeError when the Google Cloud configuration is incomplete; other
+    failures propagate to the caller.
+    """
+    if not query and not image_data:
+        raise ValueError("Either query or image_data must be provided")
+
+    # Get configuration from environment variables
+    project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
+    region = os.getenv('VERTEX_AI_LOCATION')
+    feature_store_id = os.getenv('FEATURE_STORE_ID')
+    feature_view_id = os.getenv('ENTITY_TYPE_ID')
+    dataset = os.getenv('BIGQUERY_DATASET')
+
+    if not project_id or not region or not feature_store_id or not feature_view_id or not dataset:
+        raise RuntimeError(
+            'Google Cloud configuration is incomplete: check your environment '
+            'variables for Google Cloud, Vertex AI, and BigQuery settings.'
+        )
+
+    if executor is None:
+        executor = _get_default_executor()
+
+    start_time = time.time()
+
+    # Reuse cached service clients (constructed once per configuration)
+    vertex_service = _get_vertex_service(project_id, region, feature_store_id, feature_view_id)
+    bigquery_service = _get_bigquery_service(project_id, dataset)
+
+    # Generate embeddings
+    t0 = time.time()
+    embeddings = vertex_service.get_image_embeddings(
+        image_data=image_data,
+        contextual_text=query
+    )
+    t1 = time.time()
+    logger.info(f"Embeddings generated in {t1-t0:.2f} seconds")
+
+    # Search feature store
+    t2 = time.time()
+    search_results = vertex_service.search_feature_store(
+        embedding=embeddings,
+        neighbor_count=neighbor_count
+    )
+    t3 = time.time()
+    logger.info(f"Feature store search in {t3-t2:.2f} seconds")
+
+    if not search_results:
+        return {
+            'results': [],
+            'message': 'No matching products found',
+            'elapsed_time': time.time() - start_time
+        }
+
+    # Extract GCS URIs and product IDs
+    gcs_uri_list = [result['gcs_uri'] for result in search_results]
+    product_id_list = [result['product_id'] for result in search_results]
+
+    # Parallelize BigQuery calls on the shared pool
+    t4 = time.time()
+    future_signed_urls = executor.submit(bigquery_service.get_signed_urls, gcs_uri_list)
+    future_product_info = executor.submit(bigquery_service.get_product_info, product_id_list)
+    signed_urls = future_signed_urls.result()
+    product_info = future_product_info.result()
+    t5 = time.time()
+    logger.info(f"BigQuery get_signed_urls + get_product_info in {t5-t4:.2f} seconds")
+
+    # Combine results (optimize product info lookup). BigQuery returns
+    # integer product IDs, so key the dict by int and convert the
+    # feature-store IDs once instead of coercing types per iteration.
+    t6 = time.time()
+    product_info_dict = {info['productid']: info for info in product_info}
+    product_id_ints = [int(pid) for pid in product_id_list]
+    # Draw all placeholder prices in one vectorized call instead of one
+    # random.randint per product
+    prices = (np.random.randint(999, 9999, size=len(product_id_list)) / 100).tolist()
+    price_strs = [f"${p:.2f}" for p in prices]
+    products = []
+    for i, (product_id, pid_int, signed_url) in enumerate(zip(product_id_list, product_id_ints, signed_urls)):
+        product_info_item = product_info_dict.get(pid_int)
+        products.append({
+            'id': product_id,
+            'image_url': signed_url,
+            'name': f"Product {product_id}",
+            'description': f"This product matches your {query if query else 'image'} search",
+            'price': price_strs[i],
+            'aisle': product_info_item['aisle'] if product_info_item else 'Unknown'
+        })
+    # Normalize the whole batch in one call so the query-dependent
+    # defaults are computed once rather than per product
+    results = normalize_products(products, query=query)
+    t7 = time.time()
+    logger.info(f"Product info match + normalization in {t7-t6:.2f} seconds")
+
+    elapsed_time = time.time() - start_time
+    logger.info(f"Total search time (just before response): {elapsed_time:.2f} seconds")
+
+    return {
+        'results': results,
+        'elapsed_time': elapsed_time
+    }
@@ -1,12 +1,64 @@
 import random
+from operator import itemgetter
 
-def normalize_product(product, query=None):
-    """Ensure product dict has all required fields with defaults."""
+# Use pybase64 (SIMD-accelerated) when available for the audio/frame hot
+# paths; fall back to the stdlib codec with the same call signatures
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+b64encode = _b64.b64encode
+b64decode = _b64.b64decode
+
+if hasattr(_b64, "b64encode_as_string"):
+    b64encode_str = _b64.b64encode_as_string
+else:
+    def b64encode_str(data):
+        """Base64-encode bytes straight to str (stdlib fallback)."""
+        return _b64.b64encode(data).decode("ascii")
+
+# Dedicated RNG instance for placeholder prices: skips the module-level
+# random lock contention when defaults are drawn at high rates
+_price_rng = random.Random()
+
+def _normalize_one(product, default_description):
+    """Normalize a single product dict given a precomputed default description.
+
+    Defaults are only computed when a field is actually missing; passing them
+    as .get() second arguments evaluated the f-strings (and the RNG draw) on
+    every call.
+    """
+    product_id = product.get('id') or product.get('productid', '')
+    price = product.get('price')
+    if not price:
+        price = f"${_price_rng.randint(999, 9999) / 100:.2f}"
     return {
-        'id': product.get('id') or product.get('productid', ''),
+        'id': product_id,
         'image_url': product.get('image_url', ''),
-        'name': product.get('name', f"Product {product.get('id', product.get('productid', ''))}"),
-        'description': product.get('description', f"This product matches your {query if query else 'image'} search"),
-        'price': product.get('price', f"${random.randint(999, 9999)/100:.2f}"),
+        'name': product.get('name') or f"Product {product_id}",
+        'description': product.get('description') or default_description,
+        'price': price,
         'aisle': product.get('aisle', 'Unknown')
-    } 
\ No newline at end of file
+    }
+
+def _default_description(query):
+    return f"This product matches your {query if query else 'image'} search"
+
+def normalize_product(product, query=None):
+    """Ensure product dict has all required fields with defaults."""
+    return _normalize_one(product, _default_description(query))
+
+def normalize_products(products, query=None):
+    """Normalize a batch of products, computing the query-dependent default once."""
+    default_description = _default_description(query)
+    return [_normalize_one(product, default_description) for product in products]
+
+# Compact product shape sent back to the model after a tool call; itemgetter
+# pulls all fields in one C-level call per product
+_SUMMARY_KEYS = ('id', 'name', 'price', 'image_url', 'aisle')
+_summary_getter = itemgetter(*_SUMMARY_KEYS)
+
+def summarize_products(products, limit=5):
+    """Trim normalized products to the compact fields for model responses."""
+    return [dict(zip(_SUMMARY_KEYS, _summary_getter(p))) for p in products[:limit]]
@@ -12,8 +12,9 @@ from google.cloud.aiplatform_v1beta1.types import (
     NearestNeighborQuery,
     feature_online_store_service as feature_online_store_service_pb2
 )
-import base64
 import io
+import numpy as np
+from utils import b64decode
 from PIL import Image as PILImage
 import tempfile
 import os
@@ -32,6 +33,11 @@ class VertexAIService:
         
         # Initialize multimodal embedding model
         self.model = MultiModalEmbeddingModel.from_pretrained("multimodalembedding")
+
+        # Product-ID extraction patterns fused into one alternation and
+        # compiled once: quoted id, string_value field, image filename, then
+        # any digit run. One scan per neighbor instead of four.
+        self._pid_re = re.compile(r'"(\d+)"|string_value:\s*"(\d+)"|(\d+)\.jpg|(\d+)')
         
         # Initialize feature store clients if IDs are provided
         if feature_store_id and feature_view_id:
@@ -50,7 +56,7 @@ class VertexAIService:
     
     def _base64_to_image(self, base64_string):
         """Convert base64 string to PIL Image"""
-        image_data = base64.b64decode(base64_string)
+        image_data = b64decode(base64_string)
         image = PILImage.open(io.BytesIO(image_data))
         return image
     
@@ -70,22 +76,11 @@ class VertexAIService:
                         # Extract the base64 part after the comma
                         image_data = image_data.split(',', 1)[1]
                     
-                    # Create a temporary file to store the image
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                        temp_file.write(base64.b64decode(image_data))
-                        temp_file_path = temp_file.name
-                    
-                    logging.info(f"Saved image to temporary file: {temp_file_path}")
-
-                    # Load image from the temporary file
-                    image = vision_models.Image.load_from_file(temp_file_path)
+                    # Build the image straight from the decoded bytes: the
+                    # old tempfile round-trip paid a disk write, read, and
+                    # unlink per image for nothing
+                    image = vision_models.Image(image_bytes=b64decode(image_data))
                     logging.info("Successfully loaded image with Vertex AI")
-                    
-                    # Clean up the temporary file
-                    try:
-                        os.unlink(temp_file_path)
-                    except Exception as cleanup_error:
-                        logging.warning(f"Failed to clean up temporary file: {str(cleanup_error)}")
                 except Exception as img_error:
                     logging.error(f"Failed to process image: {str(img_error)}")
                     raise Exception(f"Failed to process image: {str(img_error)}")
@@ -102,7 +97,9 @@ class VertexAIService:
             # Use image embedding if available, otherwise use text embedding
             embedding_value = embeddings.image_embedding or embeddings.text_embedding
             logging.info(f"Successfully generated embeddings of length {len(embedding_value)}")
-            return [v for v in embedding_value]
+            # One packed float32 buffer instead of ~1400 boxed PyFloats; the
+            # protobuf embedding field accepts any numeric iterable
+            return np.fromiter(embedding_value, dtype=np.float32, count=len(embedding_value))
         
         except Exception as e:
             logging.error(f"Error generating embeddings: {str(e)}")
@@ -131,25 +128,12 @@ class VertexAIService:
             
             # Extract product ID from the feature value
             product_id_str = str(neighbor.entity_key_values.key_values.features[8].value)
-            # Try different patterns to match the product ID
-            match = None
-            patterns = [
-                r'"(\d+)"',  # Matches "1234"
-                r'string_value: "(\d+)"',  # Matches string_value: "1234"
-                r'(\d+)\.jpg',  # Matches 1234.jpg
-                r'(\d+)'  # Matches any sequence of digits
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, product_id_str)
-                if match:
-                    break
-            
+            match = self._pid_re.search(product_id_str)
             if not match:
                 logging.warning(f"Could not extract product ID from string: {product_id_str}")
                 continue
-            
-            product_id = match.group(1)
+
+            product_id = next(g for g in match.groups() if g)
             
             # Extract GCS URI
             gcs_uri = str(neighbor.entity_key_values.key_values.features[9].value)